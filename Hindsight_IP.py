@@ -1,10 +1,25 @@
+import heapq
+import math
+import os
 import random
+import time
 import numpy as np
-import gurobipy as gp
-from gurobipy import GRB
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
 
+try:
+    import gurobipy as gp
+    from gurobipy import GRB
+except ImportError:  # Only the 'gurobi' backend needs it
+    gp = None
 
-def solve_MILP_online(M, arrivals, s, processing_time=None, start_times_dict=None):
+from script_loader import load_script
+
+online_semi_online_scheduling = load_script('MC-SF_synthetic.py').online_semi_online_scheduling
+
+
+def solve_MILP_online(M, arrivals, s, processing_time=None, start_times_dict=None,
+                      backend='gurobi', mps_path=None):
     """
     Solves the MILP for the online scheduling problem.
     
@@ -17,25 +32,40 @@ def solve_MILP_online(M, arrivals, s, processing_time=None, start_times_dict=Non
     The goal is to minimize the total latency: ∑_i [ (start_time_i - a_i) + o_i ].
     
     The model:
-      Decision variables: For job i=0,...,n-1 and time t=a_i,...,T, 
+      Decision variables: For job i=0,...,n-1 and time t=a_i,...,L_i, 
          x[i,t] ∈ {0,1} indicates if job i starts at time t.
       Let T = max_i a_i + ∑_i o_i.
+      The latest start L_i comes from the MC-SF schedule (online_semi_online_scheduling),
+      of total latency L_H: an optimal schedule has total latency at most L_H and every
+      job contributes at least o_i, so no job waits more than L_H - ∑_j o_j, and
+         L_i = min(a_i + L_H - ∑_j o_j, T).
+      Start times after L_i are never optimal, so their variables are not created.
       
       Objective:
-         Minimize ∑_{i=0}^{n-1} [ (∑_{t=a_i}^{T} t * x[i,t] - a_i) + o_i ].
+         Minimize ∑_{i=0}^{n-1} [ (∑_{t=a_i}^{L_i} t * x[i,t] - a_i) + o_i ].
          
       Constraints:
-         (1) ∀ i:  ∑_{t=a_i}^{T} x[i,t] = 1.
+         (1) ∀ i:  ∑_{t=a_i}^{L_i} x[i,t] = 1.
          (2) ∀ τ=0,...,T:  
              ∑_{i: a_i ≤ τ} ∑_{t = max(a[i], τ-o[i])}^{τ-1} (s + (τ - t)) * x[i,t] ≤ M.
     
     Parameters:
       - M: Total available memory.
       - arrivals: list of dictionaries; each dictionary must contain:
-                  'arrival_time' and 'length'
+                  'arrival_time' and 'length', in whole time steps
       - s: Fixed prompt size.
       - processing_time: (Optional) Time limit for the solver (in seconds).
       - start_times_dict: (Optional) Warm-start solution, a dictionary mapping job i to a start time.
+                          Defaults to the MC-SF schedule.
+      - backend: the solver the formulation is sent to:
+          'gurobi' - gurobipy;
+          'highs'  - scipy.optimize.milp (HiGHS), no license needed. HiGHS takes no MIP
+                     start, so the warm start is applied as Gurobi would use it: if it is
+                     feasible, the result is never worse than it, also when the time limit
+                     is hit before HiGHS finds a solution;
+          'mps'    - writes the model to `mps_path` (free MPS, variables named x_i_t) and
+                     the warm start to the same path with extension .mst, for an external
+                     solver. Nothing is solved and (None, None) is returned.
     
     Returns:
       A tuple (total_latency, sol_start_times), where:
@@ -43,78 +73,646 @@ def solve_MILP_online(M, arrivals, s, processing_time=None, start_times_dict=Non
          sol_start_times is a dictionary mapping job i to its chosen start time.
       If no solution is found, returns (None, None).
     """
-    n = len(arrivals)
-    # Extract arrival times and processing lengths.
-    a = [req['arrival_time'] for req in arrivals]
-    o = [req['length'] for req in arrivals]
+    if backend == 'mps' and mps_path is None:
+        raise ValueError("backend='mps' needs mps_path")
+    milp_model = HindsightMILP(M, arrivals, s)
+    if milp_model.infeasible:
+        return None, None  # A job does not fit in memory even on its own
+    if start_times_dict is None:
+        start_times_dict = milp_model.heuristic_start_times
+    start = milp_model.start_vector(start_times_dict)
+    
+    if backend == 'gurobi':
+        x, _ = _solve_gurobi(milp_model, processing_time, start)
+    elif backend == 'highs':
+        x, _ = _solve_highs(milp_model, processing_time, start)
+    elif backend == 'mps':
+        milp_model.write_mps(mps_path)
+        milp_model.write_mst(os.path.splitext(mps_path)[0] + '.mst', start)
+        return None, None
+    else:
+        raise ValueError(f"Unknown MILP backend: {backend}")
+    
+    if x is None:
+        return None, None
+    start_times = milp_model.start_times(x)
+    sol_start_times = dict(enumerate(start_times.tolist()))
+    total_latency = int((start_times - milp_model.a + milp_model.o).sum())
+    return total_latency, sol_start_times
+
+
+def solve_MILP_rolling(M, arrivals, s, window, commit=None, time_budget=None, backend='gurobi',
+                       lp_time_limit=None, max_lp_vars=10**7):
+    """
+    Rolling-horizon heuristic for the MILP of solve_MILP_online, for instances too large
+    to solve at once.
+    
+    The windows [t0, t0+window) are solved in sequence (see RollingWindowMILP), t0
+    advancing by `commit` (window // 2 by default) each time: the jobs starting before
+    t0+commit are committed, their memory is subtracted from M in the later windows,
+    and the other jobs are solved again in the next window, which overlaps this one.
+    Each window is warm-started with the plan of the previous one completed greedily,
+    so a window has a feasible solution even when its time limit is reached.
+    
+    Parameters:
+      - M, arrivals, s: as for solve_MILP_online.
+      - window: length of the windows, in time steps.
+      - commit: step of the windows (1 <= commit <= window).
+      - time_budget: (Optional) Time limit in seconds for all the windows, split evenly
+                     among the windows left.
+      - backend: 'gurobi' or 'highs', as for solve_MILP_online.
+      - lp_time_limit: (Optional) Time limit in seconds for the LP relaxation.
+      - max_lp_vars: the LP relaxation is skipped when it has more variables.
+    
+    Returns:
+      A tuple (total_latency, sol_start_times, lower_bound), where total_latency and
+      sol_start_times describe the schedule found, or the MC-SF schedule if it is better
+      (an upper bound on the optimum), and
+      lower_bound is the optimum of the LP relaxation of the full MILP, rounded up (its
+      latest start times come from the schedule found), or ∑_i o_i when the LP is skipped
+      or not solved in time.
+      If a job does not fit in memory, returns (None, None, None).
+    """
+    if backend not in ('gurobi', 'highs'):
+        raise ValueError(f"Unknown MILP backend: {backend}")
+    solve = _solve_gurobi if backend == 'gurobi' else _solve_highs
+    commit = window // 2 if commit is None else commit
+    if not 1 <= commit <= window:
+        raise ValueError("commit must be between 1 and window")
+    arrivals = _whole_time_steps(arrivals)
+    a = np.array([req['arrival_time'] for req in arrivals], dtype=np.int64)
+    o = np.array([req['length'] for req in arrivals], dtype=np.int64)
+    if np.any(s + o > M):
+        return None, None, None
+    
+    order = np.argsort(a, kind='stable').tolist()
+    start_times = np.empty(len(a), dtype=np.int64)
+    num_arrived = 0
+    pending = []  # Jobs arrived before t1 and not committed
+    planned = {}  # Job -> start time planned by the last window
+    running = np.empty(0, dtype=np.int64)  # Committed jobs that may still hold memory
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    t0 = int(a.min())
+    while num_arrived < len(a) or pending:
+        t1 = t0 + window
+        while num_arrived < len(a) and a[order[num_arrived]] < t1:
+            pending.append(order[num_arrived])
+            num_arrived += 1
+        if not pending:
+            t0 = int(a[order[num_arrived]])
+            continue
+        
+        jobs = np.array(pending)
+        running = running[start_times[running] + o[running] > t0]
+        last_row = t1 - 1 + int(o[jobs].max())
+        held = _memory_matrix(start_times[running], o[running], s, t0 + 1, last_row).sum(axis=1)
+        window_model = RollingWindowMILP(a[jobs], o[jobs], s, t0, t1, M - np.asarray(held).ravel())
+        position = {job: i for i, job in enumerate(pending)}
+        start = window_model.start_vector(window_model.greedy_start_times(
+            {position[job]: t for job, t in planned.items()}))
+        
+        time_limit = None
+        if deadline is not None:
+            windows_left = max(1, (int(a.max()) - t0) // commit + 1)
+            time_limit = max(0.0, deadline - time.perf_counter()) / windows_left
+        x, _ = solve(window_model, time_limit, start)
+        window_starts = window_model.start_times(start if x is None else x)
+        
+        committed = window_starts < t0 + commit
+        start_times[jobs[committed]] = window_starts[committed]
+        running = np.concatenate((running, jobs[committed]))
+        pending = jobs[~committed].tolist()
+        planned = {job: t for job, t in zip(pending, window_starts[~committed].tolist()) if t < t1}
+        t0 += commit
+    
+    total_latency = int((start_times - a + o).sum())
+    sol_start_times = dict(enumerate(start_times.tolist()))
+    heuristic_start_times, heuristic_latency = online_semi_online_scheduling(M, arrivals, s)
+    if heuristic_latency < total_latency:
+        total_latency, sol_start_times = heuristic_latency, heuristic_start_times
+    
+    lower_bound = int(o.sum())
+    num_lp_vars = np.minimum(total_latency - lower_bound, a.max() + o.sum() - a).sum() + len(a)
+    if num_lp_vars <= max_lp_vars:
+        relaxation = HindsightMILP(M, arrivals, s, upper_bound=total_latency)
+        lp_value = _solve_lp(relaxation, backend, lp_time_limit)
+        if lp_value is not None:
+            lower_bound = max(lower_bound, math.ceil(lp_value - 1e-6))
+    return total_latency, sol_start_times, lower_bound
+
+
+def solve_MILP_coarse(M, arrivals, s, delta, processing_time=None, backend='gurobi'):
+    """
+    Brackets the optimum of solve_MILP_online with two models on a grid of width delta
+    (see CoarseHindsightMILP), which have about delta times fewer variables and memory
+    rows than the exact model:
+      - the conservative model, whose solution is a feasible schedule;
+      - the optimistic model, a relaxation whose optimal value (or the lower bound of
+        the solver when the time limit is reached) is a lower bound.
+    With delta=1, the optimistic model is the exact one.
+    
+    Parameters:
+      - M, arrivals, s, processing_time: as for solve_MILP_online (the time limit applies
+                                         to each of the two models).
+      - delta: width of the buckets, in time steps.
+      - backend: 'gurobi' or 'highs', as for solve_MILP_online.
+    
+    Returns:
+      A tuple (total_latency, sol_start_times, lower_bound), where total_latency and
+      sol_start_times describe the schedule of the conservative model, and lower_bound is
+      the bound of the optimistic model, rounded up (at least ∑_i o_i).
+      If a job does not fit in memory, returns (None, None, None).
+    """
+    if backend not in ('gurobi', 'highs'):
+        raise ValueError(f"Unknown MILP backend: {backend}")
+    solve = _solve_gurobi if backend == 'gurobi' else _solve_highs
+    arrivals = _whole_time_steps(arrivals)
+    
+    try:
+        upper_bound = online_semi_online_scheduling(M, arrivals, s)[1]
+    except ValueError:
+        return None, None, None  # A job does not fit in memory even on its own
+    upper = CoarseHindsightMILP(M, arrivals, s, delta, conservative=True, upper_bound=upper_bound)
+    start = upper.start_vector(upper.heuristic_start_times)
+    x, _ = solve(upper, processing_time, start)
+    start_times = upper.start_times(start if x is None else x)
+    total_latency = int((start_times - upper.a + upper.o).sum())
+    sol_start_times = dict(enumerate(start_times.tolist()))
+    
+    upper_bound = min(upper_bound, total_latency)
+    lower = CoarseHindsightMILP(M, arrivals, s, delta, conservative=False, upper_bound=upper_bound)
+    _, bound = solve(lower, processing_time, lower.start_vector(sol_start_times))
+    lower_bound = int(upper.o.sum())
+    if bound is not None and np.isfinite(bound):
+        lower_bound = max(lower_bound, math.ceil(bound + lower.objective_constant - 1e-6))
+    return total_latency, sol_start_times, lower_bound
+
+
+def coarsening_sweep(M, arrivals, s, deltas, processing_time=None, backend='gurobi'):
+    """
+    Runs solve_MILP_coarse for each bucket width of `deltas` and returns one dict per
+    width with the bounds, the relative gap (upper_bound - lower_bound) / lower_bound,
+    which is the loss of the coarsening, and the solve time in seconds.
+    """
+    rows = []
+    for delta in deltas:
+        start = time.perf_counter()
+        upper_bound, _, lower_bound = solve_MILP_coarse(M, arrivals, s, delta, processing_time, backend)
+        rows.append({'delta': delta,
+                     'upper_bound': upper_bound,
+                     'lower_bound': lower_bound,
+                     'gap': None if upper_bound is None else (upper_bound - lower_bound) / lower_bound,
+                     'solve_time': time.perf_counter() - start})
+    return rows
+
+
+def solve_MILP_capacity_curve(M_values, arrivals, s, processing_time=None, backend='gurobi'):
+    """
+    Solves the MILP of solve_MILP_online for each memory capacity M of `M_values`, with
+    a single model: only the right-hand side of the memory constraints depends on M.
+    
+    The model is built for the smallest capacity at which every job fits. Its latest
+    start times stay valid for the larger ones, since the optimal total latency does not
+    increase with M. The capacities are then solved in increasing order, each one
+    warm-started with the solution for the previous capacity, which remains feasible, or
+    with the MC-SF schedule if it is better. With gurobipy, the same model is
+    re-optimized after changing the right-hand side; once a schedule without any waiting
+    is found, the larger capacities reuse it without solving.
+    
+    Parameters:
+      - M_values: the memory capacities.
+      - arrivals, s, processing_time, backend: as for solve_MILP_online (the time limit
+                                               applies to each capacity; backend 'gurobi'
+                                               or 'highs').
+    
+    Returns:
+      The latency-vs-memory curve: one dict per capacity, in increasing order, with the
+      keys 'M', 'total_latency' and 'start_times' (None if a job does not fit in memory
+      or no solution is found) and 'solve_time' (in seconds).
+    """
+    if backend not in ('gurobi', 'highs'):
+        raise ValueError(f"Unknown MILP backend: {backend}")
+    s_plus_o = s + max(req['length'] for req in arrivals)
+    curve = []
+    milp_model = gurobi_model = x = None
+    for M in sorted(set(M_values)):
+        start_time = time.perf_counter()
+        total_latency = sol_start_times = None
+        if M >= s_plus_o:
+            if milp_model is None:
+                milp_model = HindsightMILP(M, arrivals, s)
+                min_latency = int(milp_model.o.sum())
+                if backend == 'gurobi':
+                    gurobi_model, gurobi_x, memory = _build_gurobi(milp_model, processing_time)
+            milp_model.capacity = np.full(len(milp_model.capacity), M)
+            
+            start = milp_model.start_vector(online_semi_online_scheduling(M, arrivals, s)[0])
+            if x is not None and not (milp_model.is_feasible(start) and milp_model.c @ start < milp_model.c @ x):
+                start = x
+            if x is not None and milp_model.c @ x + milp_model.objective_constant == min_latency:
+                pass  # No job waits: the schedule is optimal for all the larger capacities
+            elif backend == 'gurobi':
+                memory.RHS = milp_model.capacity
+                x, _ = _optimize_gurobi(gurobi_model, gurobi_x, start)
+            else:
+                x, _ = _solve_highs(milp_model, processing_time, start)
+            if x is not None:
+                x = np.round(x)
+                start_times = milp_model.start_times(x)
+                total_latency = int((start_times - milp_model.a + milp_model.o).sum())
+                sol_start_times = dict(enumerate(start_times.tolist()))
+        curve.append({'M': M, 'total_latency': total_latency, 'start_times': sol_start_times,
+                      'solve_time': time.perf_counter() - start_time})
+    return curve
+
+
+class HindsightMILP:
+    """
+    The formulation of solve_MILP_online as arrays, shared by the solver backends.
+    
+    Decision variables x[i,t], t = a[i] to latest[i], are laid out job by job in one
+    vector: x[(i,t)] is entry first[i] + (t - a[i]); job and t_of give the job and the
+    start time of every entry. The model is
+       minimize c x + objective_constant
+       subject to start_once x = 1 and memory x <= capacity, x binary.
+    A known `upper_bound` on the optimal total latency tightens the latest start times
+    when it is below the one of the MC-SF schedule.
+    """
+    
+    def __init__(self, M, arrivals, s, upper_bound=None):
+        # Extract arrival times and processing lengths.
+        arrivals = _whole_time_steps(arrivals)
+        a = self.a = np.array([req['arrival_time'] for req in arrivals], dtype=np.int64)
+        o = self.o = np.array([req['length'] for req in arrivals], dtype=np.int64)
+        
+        # Time horizon: T = max(a) + sum(o)
+        T = int(a.max() + o.sum())
+        
+        # Latest start times from the MC-SF schedule, which is also the default warm start.
+        try:
+            self.heuristic_start_times, heuristic_latency = online_semi_online_scheduling(M, arrivals, s)
+        except ValueError:
+            self.infeasible = True
+            return
+        self.infeasible = False
+        if upper_bound is not None:
+            heuristic_latency = min(heuristic_latency, upper_bound)
+        latest = np.minimum(a + (heuristic_latency - o.sum()), T)
+        # The memory constraints are only needed up to the latest possible completion.
+        T_mem = int(min(T, (latest + o).max()))
+        
+        self._layout(a, latest)
+        
+        # Objective: For each job i, the contribution is:
+        #   (start_time_i - a[i]) + o[i], where start_time_i = sum_{t=a[i]}^latest[i] t * x[i,t].
+        # Hence, the overall objective is:
+        #   ∑_{i=0}^{n-1} [ (∑_{t=a[i]}^latest[i] t*x[i,t] - a[i]) + o[i] ].
+        self.objective_constant = int((o - a).sum())
+        
+        # Constraint (2): Memory usage constraint.
+        # For each time τ from 0 to T_mem, consider all jobs i that have arrived (a[i] ≤ τ).
+        # If job i started at time t, then it is active at τ if t ≤ τ < t+o[i].
+        # In our corrected formulation, we sum for t from lower_bound = max(a[i], τ-o[i])
+        # up to τ-1. (Thus a job starting exactly at τ does not count.)
+        self.memory = _memory_matrix(self.t_of, o[self.job], s, 0, T_mem)
+        self.capacity = np.full(T_mem + 1, M)
+    
+    def _layout(self, earliest, latest):
+        """
+        Variables x[i,t] for t = earliest[i] to latest[i], laid out job by job, with
+        objective coefficients t, and the constraints (1): each job i starts exactly once.
+        """
+        self.earliest, self.latest = earliest, latest
+        num_starts = latest + 1 - earliest
+        first = self.first = np.concatenate(([0], np.cumsum(num_starts)[:-1]))
+        job = self.job = np.repeat(np.arange(len(earliest)), num_starts)
+        t_of = self.t_of = np.arange(len(job)) - first[job] + earliest[job]
+        self.c = t_of
+        self.start_once = sp.csr_matrix((np.ones(len(job)), (job, np.arange(len(job)))),
+                                        shape=(len(earliest), len(job)))
+    
+    @property
+    def num_vars(self):
+        return len(self.job)
     
-    # Time horizon: T = max(a) + sum(o)
-    T = max(a) + sum(o)
+    def start_vector(self, start_times_dict):
+        """Warm start as a 0/1 vector (jobs without a valid start time have none)."""
+        earliest, n = self.earliest, len(self.a)
+        init_start = np.array([start_times_dict.get(i, earliest[i]) for i in range(n)])
+        start = np.zeros(self.num_vars)
+        valid = (init_start >= earliest) & (init_start <= self.latest)
+        start[self.first[valid] + init_start[valid] - earliest[valid]] = 1
+        return start
     
+    def is_feasible(self, x):
+        return (np.array_equal(self.start_once @ x, np.ones(len(self.a)))
+                and bool(np.all(self.memory @ x <= self.capacity)))
+    
+    def start_times(self, x):
+        """First chosen start of each job (a[i] if there is none)."""
+        chosen = np.flatnonzero(x > 0.5)
+        jobs, index = np.unique(self.job[chosen], return_index=True)
+        start_times = self.a.copy()
+        start_times[jobs] = self.t_of[chosen[index]]
+        return start_times
+    
+    def variable_names(self):
+        return [f"x_{i}_{t}" for i, t in zip(self.job.tolist(), self.t_of.tolist())]
+    
+    def write_mps(self, path):
+        """Writes the model in free MPS format (rows StartOnce_i and Mem_τ, as with gurobipy)."""
+        names = self.variable_names()
+        rows = (['obj'] + [f"StartOnce_{i}" for i in range(len(self.a))]
+                + [f"Mem_{tau}" for tau in range(len(self.capacity))])
+        matrix = sp.vstack([sp.csr_matrix(self.c.reshape(1, -1)), self.start_once, self.memory]).tocsc()
+        with open(path, 'w') as f:
+            f.write("NAME Online_Schedule\nROWS\n N obj\n")
+            f.writelines(f" E {row}\n" for row in rows[1:1 + len(self.a)])
+            f.writelines(f" L {row}\n" for row in rows[1 + len(self.a):])
+            f.write("COLUMNS\n")
+            for k, name in enumerate(names):
+                begin, end = matrix.indptr[k], matrix.indptr[k + 1]
+                f.writelines(f"    {name} {rows[r]} {v:.17g}\n"
+                             for r, v in zip(matrix.indices[begin:end].tolist(),
+                                             matrix.data[begin:end].tolist()))
+            f.write("RHS\n")
+            # The objective constant is the negated right-hand side of the objective row
+            f.write(f"    rhs obj {-self.objective_constant}\n")
+            f.writelines(f"    rhs {row} 1\n" for row in rows[1:1 + len(self.a)])
+            f.writelines(f"    rhs {row} {m}\n" for row, m in zip(rows[1 + len(self.a):], self.capacity.tolist()))
+            f.write("BOUNDS\n")
+            f.writelines(f" BV bnd {name}\n" for name in names)
+            f.write("ENDATA\n")
+    
+    def write_mst(self, path, start):
+        """Writes a warm start in the MIP start (.mst) format."""
+        with open(path, 'w') as f:
+            f.write("# MIP start\n")
+            f.writelines(f"{name} {int(v)}\n" for name, v in zip(self.variable_names(), start.tolist()))
+
+
+class RollingWindowMILP(HindsightMILP):
+    """
+    Subproblem of solve_MILP_rolling over the window [t0, t1) for the pending jobs
+    (arrived before t1 and not committed yet). Job i starts at some t in
+    [max(a[i], t0), t1 - 1], or is deferred: its last start "t1" stands for any start
+    from t1 on, costs t1 and uses no memory in the subproblem. The memory rows cover
+    t0+1 to the completion of the last job that can start in the window, and
+    `capacity` is M minus the memory held by the committed jobs.
+    """
+    
+    def __init__(self, a, o, s, t0, t1, capacity):
+        self.a, self.o, self.s = a, o, s
+        self.t0 = t0
+        self._layout(np.maximum(a, t0), np.full(len(a), t1))
+        self.objective_constant = int((o - a).sum())
+        lengths = np.where(self.t_of < t1, o[self.job], 0)
+        self.memory = _memory_matrix(self.t_of, lengths, s, t0 + 1, t0 + len(capacity))
+        self.capacity = capacity
+    
+    def greedy_start_times(self, planned):
+        """
+        A feasible schedule to warm-start the window: the jobs of `planned` (position ->
+        start time, feasible together) keep their start, and the others, shortest first,
+        start as early as the remaining memory allows, or are deferred.
+        """
+        usage = np.zeros(len(self.capacity))
+        first_row = self.t0 + 1
+        start_times = dict(planned)
+        for i, t in planned.items():
+            usage[t + 1 - first_row:t + 1 - first_row + self.o[i]] += self.s + np.arange(1, self.o[i] + 1)
+        for i in np.argsort(self.o, kind='stable').tolist():
+            if i in planned:
+                continue
+            start_times[i] = int(self.latest[i])
+            need = self.s + np.arange(1, self.o[i] + 1)
+            for t in range(int(self.earliest[i]), int(self.latest[i])):
+                rows = slice(t + 1 - first_row, t + 1 - first_row + self.o[i])
+                if np.all(usage[rows] + need <= self.capacity[rows]):
+                    usage[rows] += need
+                    start_times[i] = t
+                    break
+        return start_times
+
+
+class CoarseHindsightMILP(HindsightMILP):
+    """
+    The model of HindsightMILP with start times on a grid of width delta: variable j of
+    job i is its start in the bucket [jΔ, (j+1)Δ), and memory row k stands for the
+    bucket of times (kΔ, (k+1)Δ].
+      - Conservative model: job i starts at jΔ, for the multiples of Δ from a[i] on, and
+        row k bounds the sum of the peak memory of each job within the bucket. The memory
+        at every time is at most this sum, so each solution is a feasible schedule.
+      - Optimistic model: job i starts anywhere in [max(a[i], jΔ), (j+1)Δ - 1] and costs
+        max(a[i], jΔ), and row k is the memory constraint at the time τ = kΔ, counting
+        for each job only the memory it holds at τ wherever it starts in its bucket.
+        The buckets of any schedule satisfy it, so its optimum is a lower bound.
+    Both are warm-started with a greedy schedule of the conservative model
+    (`heuristic_start_times`). The latest starts are the ones of HindsightMILP, from the
+    total latency of this schedule or `upper_bound` (an upper bound on the optimum of
+    solve_MILP_online) if smaller; in the conservative model, a job can also start as
+    late as in the greedy schedule, so that the warm start is a solution.
+    """
+    
+    def __init__(self, M, arrivals, s, delta, conservative=True, upper_bound=None):
+        self.delta = delta
+        arrivals = _whole_time_steps(arrivals)
+        a = self.a = np.array([req['arrival_time'] for req in arrivals], dtype=np.int64)
+        o = self.o = np.array([req['length'] for req in arrivals], dtype=np.int64)
+        self.infeasible = bool(np.any(s + o > M))
+        if self.infeasible:
+            return
+        self.heuristic_start_times, heuristic_latency = _greedy_grid_schedule(a, o, s, M, delta)
+        if upper_bound is not None:
+            heuristic_latency = min(heuristic_latency, upper_bound)
+        latest = a + (heuristic_latency - o.sum())
+        
+        if conservative:
+            latest = np.maximum(latest, [self.heuristic_start_times[i] for i in range(len(a))])
+            self._layout(-(-a // delta), latest // delta)
+            bucket = self.t_of
+            self.t_of = bucket * delta
+            # Job i starting at jΔ holds s + min((m+1)Δ, o[i]) at most in the bucket of row j+m.
+            num_rows = -(-o[self.job] // delta)
+            row_first = bucket
+            m = _ranges(num_rows)
+            coefficients = s + np.minimum((m + 1) * delta, np.repeat(o[self.job], num_rows))
+        else:
+            self._layout(a // delta, latest // delta)
+            bucket = self.t_of
+            self.t_of = np.maximum(a[self.job], bucket * delta)
+            # Job i holds at least s + kΔ - ((j+1)Δ - 1) at τ = kΔ, for kΔ from (j+1)Δ up to
+            # its earliest completion max(a[i], jΔ) + o[i].
+            row_first = bucket + 1
+            num_rows = np.maximum((self.t_of + o[self.job]) // delta - row_first + 1, 0)
+            m = _ranges(num_rows)
+            coefficients = s + m * delta + 1
+        self.c = self.t_of
+        self.objective_constant = int((o - a).sum())
+        
+        column = np.repeat(np.arange(self.num_vars), num_rows)
+        rows = np.repeat(row_first, num_rows) + m
+        self.memory = sp.csr_matrix((coefficients, (rows, column)),
+                                    shape=(int(rows.max(initial=0)) + 1, self.num_vars))
+        self.capacity = np.full(self.memory.shape[0], M)
+    
+    def start_vector(self, start_times_dict):
+        return super().start_vector({i: t // self.delta for i, t in start_times_dict.items()})
+
+
+def _whole_time_steps(arrivals):
+    """
+    The jobs with integer arrival times and lengths. The model is in whole time steps:
+    casting a fractional arrival time would floor it and let the job start before it
+    arrives, so it is an error.
+    """
+    jobs = []
+    for req in arrivals:
+        job = dict(req)
+        for name in ('arrival_time', 'length'):
+            if not float(req[name]).is_integer():
+                raise ValueError(f"Job {name} must be a whole number of time steps, got {req[name]}")
+            job[name] = int(req[name])
+        jobs.append(job)
+    return jobs
+
+
+def _ranges(counts):
+    """Concatenation of arange(count) for each count."""
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _greedy_grid_schedule(a, o, s, M, delta):
+    """
+    Schedule of the conservative model of CoarseHindsightMILP, in the manner of MC-SF:
+    at each multiple of delta, the jobs that have arrived start shortest first as long
+    as their memory fits. Returns the start times (as a dictionary) and the total latency.
+    """
+    num_buckets = -(-o // delta)
+    first_bucket = -(-a // delta)
+    usage = np.zeros(int(first_bucket.max() + num_buckets.sum()) + 1)
+    order = np.argsort(first_bucket, kind='stable').tolist()
+    start_times = {}
+    waiting = []  # Heap of (length, job) of the jobs that have arrived
+    num_arrived = 0
+    j = 0
+    while num_arrived < len(a) or waiting:
+        if not waiting:
+            j = max(j, int(first_bucket[order[num_arrived]]))
+        while num_arrived < len(a) and first_bucket[order[num_arrived]] <= j:
+            i = order[num_arrived]
+            heapq.heappush(waiting, (int(o[i]), i))
+            num_arrived += 1
+        not_started = []
+        while waiting:
+            length, i = heapq.heappop(waiting)
+            need = s + np.minimum(delta * np.arange(1, num_buckets[i] + 1), length)
+            rows = slice(j, j + num_buckets[i])
+            if np.all(usage[rows] + need <= M):
+                usage[rows] += need
+                start_times[i] = j * delta
+            else:
+                not_started.append((length, i))
+        waiting = not_started
+        heapq.heapify(waiting)
+        j += 1
+    latency = sum(start_times[i] - int(a[i]) + int(o[i]) for i in range(len(a)))
+    return start_times, latency
+
+
+def _memory_matrix(t_of, lengths, s, first_row, last_row):
+    """
+    Memory coefficients s + d of the starts t_of (of jobs of the given lengths) in the
+    rows τ = t+d, d = 1..length, first_row ≤ τ ≤ last_row, as a CSR matrix with one row
+    per τ from first_row.
+    """
+    d_first = np.maximum(1, first_row - t_of)
+    num_rows = np.maximum(np.minimum(lengths, last_row - t_of) - d_first + 1, 0)
+    column = np.repeat(np.arange(len(t_of)), num_rows)
+    d = (np.arange(len(column)) - np.repeat(np.cumsum(num_rows) - num_rows, num_rows)
+         + np.repeat(d_first, num_rows))
+    return sp.csr_matrix((s + d, (t_of[column] + d - first_row, column)),
+                         shape=(last_row - first_row + 1, len(t_of)))
+
+
+def _solve_gurobi(milp_model, processing_time, start):
+    """
+    Returns the solution found (None if there is none) and a lower bound on c x, the
+    objective without its constant.
+    """
+    model, x, _ = _build_gurobi(milp_model, processing_time)
+    return _optimize_gurobi(model, x, start)
+
+
+def _build_gurobi(milp_model, processing_time):
+    """The gurobipy model, its variables and its memory constraints."""
+    if gp is None:
+        raise ImportError("The 'gurobi' backend needs gurobipy")
     # Create the model.
     model = gp.Model("Online_Schedule")
     
     if processing_time is not None:
         model.setParam('TimeLimit', processing_time)
     
-    # Create decision variables: x[i,t] for each job i and for t = a[i] to T.
-    x = {}
-    for i in range(n):
-        for t in range(a[i], T+1):
-            x[(i,t)] = model.addVar(vtype=GRB.BINARY, name=f"x_{i}_{t}")
-    model.update()
-    
-    # Objective: For each job i, the contribution is:
-    #   (start_time_i - a[i]) + o[i], where start_time_i = sum_{t=a[i]}^T t * x[i,t].
-    # Hence, the overall objective is:
-    #   ∑_{i=0}^{n-1} [ (∑_{t=a[i]}^T t*x[i,t] - a[i]) + o[i] ].
-    obj_expr = gp.LinExpr()
-    for i in range(n):
-        for t in range(a[i], T+1):
-            obj_expr.addTerms(t, x[(i,t)])
-        obj_expr.addConstant(-a[i] + o[i])
-    model.setObjective(obj_expr, GRB.MINIMIZE)
-    
-    # Constraint (1): Each job i must start exactly once.
-    for i in range(n):
-        model.addConstr(gp.quicksum(x[(i,t)] for t in range(a[i], T+1)) == 1,
-                        name=f"StartOnce_{i}")
-    
-    # Constraint (2): Memory usage constraint.
-    # For each time τ from 0 to T, consider all jobs i that have arrived (a[i] ≤ τ).
-    # If job i started at time t, then it is active at τ if t ≤ τ < t+o[i].
-    # In our corrected formulation, we sum for t from lower_bound = max(a[i], τ-o[i])
-    # up to τ-1. (Thus a job starting exactly at τ does not count.)
-    for tau in range(0, T+1):
-        mem_expr = gp.LinExpr()
-        for i in range(n):
-            if a[i] <= tau:
-                lower_bound = max(a[i], tau - o[i])
-                for t in range(lower_bound, tau):
-                    mem_expr.addTerms(s + (tau - t), x[(i,t)])
-        model.addConstr(mem_expr <= M, name=f"Mem_{tau}")
-    
-    # (Optional) Warm-start: apply the provided start_times_dict.
-    if start_times_dict is not None:
-        for i in range(n):
-            init_start = start_times_dict.get(i, a[i])
-            for t in range(a[i], T+1):
-                x[(i,t)].start = 1 if t == init_start else 0
+    x = model.addMVar(milp_model.num_vars, vtype=GRB.BINARY, obj=milp_model.c, name="x")
+    model.ObjCon = milp_model.objective_constant
+    model.ModelSense = GRB.MINIMIZE
+    model.addMConstr(milp_model.start_once, x, '=', np.ones(len(milp_model.a)), name="StartOnce")
+    memory = model.addMConstr(milp_model.memory, x, '<', milp_model.capacity, name="Mem")
+    return model, x, memory
+
+
+def _optimize_gurobi(model, x, start):
+    x.Start = start
     model.update()
     
     # Optimize the model.
     model.optimize()
     
     if model.Status in [GRB.OPTIMAL, GRB.INTERRUPTED, GRB.TIME_LIMIT]:
-        sol_start_times = {}
-        for i in range(n):
-            for t in range(a[i], T+1):
-                if x[(i,t)].X > 0.5:
-                    sol_start_times[i] = t
-                    break
-            if i not in sol_start_times:
-                sol_start_times[i] = a[i]
-        total_latency = sum(sol_start_times[i] - a[i] + o[i] for i in range(n))
-        return total_latency, sol_start_times
-    else:
-        return None, None
+        return x.X, model.ObjBound - model.ObjCon
+    return None, None
+
+
+def _solve_highs(milp_model, processing_time, start):
+    """Same as _solve_gurobi."""
+    options = {}
+    if processing_time is not None:
+        options['time_limit'] = processing_time
+    result = milp(milp_model.c,
+                  constraints=[LinearConstraint(milp_model.start_once, 1, 1),
+                               LinearConstraint(milp_model.memory, -np.inf, milp_model.capacity)],
+                  integrality=np.ones(milp_model.num_vars),
+                  bounds=Bounds(0, 1),
+                  options=options)
+    x = result.x
+    bound = getattr(result, 'mip_dual_bound', None)
+    # Gurobi keeps a feasible MIP start as incumbent: never return anything worse
+    if milp_model.is_feasible(start) and (x is None or milp_model.c @ start < milp_model.c @ np.round(x)):
+        return start, bound
+    return x, bound
+
+
+def _solve_lp(milp_model, backend, time_limit):
+    """Optimal value of the LP relaxation, or None if it is not solved to optimality."""
+    if backend == 'gurobi':
+        if gp is None:
+            raise ImportError("The 'gurobi' backend needs gurobipy")
+        model = gp.Model("Online_Schedule_LP")
+        if time_limit is not None:
+            model.setParam('TimeLimit', time_limit)
+        x = model.addMVar(milp_model.num_vars, lb=0, ub=1, vtype=GRB.CONTINUOUS, obj=milp_model.c, name="x")
+        model.ObjCon = milp_model.objective_constant
+        model.ModelSense = GRB.MINIMIZE
+        model.addMConstr(milp_model.start_once, x, '=', np.ones(len(milp_model.a)), name="StartOnce")
+        model.addMConstr(milp_model.memory, x, '<', milp_model.capacity, name="Mem")
+        model.optimize()
+        return model.ObjVal if model.Status == GRB.OPTIMAL else None
+    
+    options = {}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    result = linprog(milp_model.c, A_ub=milp_model.memory, b_ub=milp_model.capacity,
+                     A_eq=milp_model.start_once, b_eq=np.ones(len(milp_model.a)),
+                     bounds=(0, 1), method='highs', options=options)
+    return result.fun + milp_model.objective_constant if result.status == 0 else None
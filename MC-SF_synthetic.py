@@ -1,96 +1,219 @@
+import heapq
+import math
+
+import numpy as np
+
+from waiting_queue import WaitingQueue
+
+
+class FeasibilityEngine:
+    """
+    Memory usage of the scheduled jobs, evaluated at their critical points.
+
+    A job with start time p and length o uses s + (x - p) memory at every time x <= p + o.
+    The engine keeps NumPy arrays of the start times and end times (p + o) of the ongoing
+    jobs S together with the jobs accepted so far at the current time, plus the sorted
+    critical points (the end times) and the usage already evaluated at each of them.
+    Adding a candidate only adds its own contribution to the points it covers and
+    evaluates the usage at its own end time, instead of recomputing every point from
+    every job.
+    """
+
+    def __init__(self, M, s):
+        self.M = M
+        self.s = s
+        self.starts = np.empty(0, dtype=np.int64)
+        self.ends = np.empty(0, dtype=np.int64)
+        self.points = np.empty(0, dtype=np.int64)  # Sorted distinct end times
+        self.usage = np.empty(0, dtype=np.int64)  # Usage at each point
+
+    @classmethod
+    def from_jobs(cls, M, s, starts, lengths):
+        """Builds the engine for jobs that have all started, without checking M."""
+        engine = cls(M, s)
+        engine.starts = np.asarray(starts, dtype=np.int64)
+        engine.ends = engine.starts + np.asarray(lengths, dtype=np.int64)
+        engine.points = np.unique(engine.ends)
+        # Jobs still running at point x are those with end >= x: a suffix in end order.
+        order = np.argsort(engine.ends, kind='stable')
+        sorted_ends = engine.ends[order]
+        start_suffix = np.concatenate((np.cumsum(engine.starts[order][::-1])[::-1], [0]))
+        first = np.searchsorted(sorted_ends, engine.points, side='left')
+        count = len(sorted_ends) - first
+        engine.usage = count * (s + engine.points) - start_suffix[first]
+        return engine
+
+    def release(self, t):
+        """Drops the jobs finished by time t and the critical points no longer ahead."""
+        alive = self.ends > t
+        if not alive.all():
+            self.starts = self.starts[alive]
+            self.ends = self.ends[alive]
+        first = np.searchsorted(self.points, t, side='right')
+        if first:
+            self.points = self.points[first:]
+            self.usage = self.usage[first:]
+
+    def try_add(self, t, o_val):
+        """
+        Adds a job of length o_val starting at time t if the usage stays within M at every
+        critical point, including the job's own end time. Returns True if it was added.
+        """
+        end = t + o_val
+        # The candidate is active at every existing critical point x <= t + o.
+        covered = np.searchsorted(self.points, end, side='right')
+        usage = self.usage[:covered] + (self.s + self.points[:covered] - t)
+        if covered and usage.max() > self.M:
+            return False
+        new_point = not (covered and self.points[covered - 1] == end)
+        if new_point:
+            active = self.ends >= end
+            own = int(np.sum(self.s + end - self.starts[active])) + self.s + o_val
+            if own > self.M:
+                return False
+        self.usage[:covered] = usage
+        if new_point:
+            self.points = np.insert(self.points, covered, end)
+            self.usage = np.insert(self.usage, covered, own)
+        self.starts = np.append(self.starts, t)
+        self.ends = np.append(self.ends, end)
+        return True
+
+    def next_admissible(self, t, o_val, horizon):
+        """
+        Returns the first time t' with t < t' < horizon at which try_add(t', o_val) would
+        succeed, or horizon if there is none. Assumes no job finishes before horizon, so
+        the critical points and their usage stay fixed in between.
+        """
+        s, M = self.s, self.M
+        points, usage = self.points, self.usage
+        # A job starting at t' covers the existing point x when t' >= x - o, and then
+        # overflows it while t' < usage(x) + s + x - M.
+        lo = [points - o_val]
+        hi = [usage + s + points - M - 1]
+        # Its own end point E = t' + o in (x_{k-1}, x_k] sees the c_k jobs with end >= x_k,
+        # which use c_k * (s + E) - (sum of their starts); overflow for E > N / c_k.
+        order = np.argsort(self.ends, kind='stable')
+        sorted_ends = self.ends[order]
+        start_suffix = np.concatenate((np.cumsum(self.starts[order][::-1])[::-1], [0]))
+        first = np.searchsorted(sorted_ends, points, side='left')
+        count = len(sorted_ends) - first
+        numer = M - s - o_val + start_suffix[first] - count * s
+        prev = np.concatenate(([t + o_val], points[:-1]))
+        lo.append(np.maximum(prev + 1, numer // np.maximum(count, 1) + 1) - o_val)
+        hi.append(points - o_val)
+        if s + o_val > M:
+            return horizon  # Never fits, even on an empty machine
+        lo = np.concatenate(lo)
+        hi = np.concatenate(hi)
+        blocked = lo <= hi
+        lo, hi = lo[blocked], hi[blocked]
+        order = np.argsort(lo, kind='stable')
+        lo, hi = lo[order], hi[order]
+        # Sweep the blocked intervals in order of their start for the first free time.
+        reach = np.maximum(np.maximum.accumulate(hi + 1), t + 1)
+        cur = np.concatenate(([t + 1], reach[:-1]))
+        gaps = np.nonzero(lo > cur)[0]
+        t_next = int(cur[gaps[0]]) if gaps.size else int(max(t + 1, reach[-1] if reach.size else t + 1))
+        return min(t_next, horizon)
+
+
 def check_feasible(t, S, U_candidate, M, s):
-    critical_points = set()
-    # Critical points from ongoing requests: p + o for each in S.
-    for (p, o_val) in S.values():
-        critical_points.add(p + o_val)
-    # Critical points from new candidate requests: t + o for each candidate.
+    if S:
+        starts, lengths = zip(*S.values())
+    else:
+        starts, lengths = (), ()
+    engine = FeasibilityEngine.from_jobs(M, s, starts, lengths)
+    if engine.usage.size and engine.usage.max() > M:
+        return False
+    # Adding jobs never lowers the usage, so U_candidate fits iff every prefix of it fits.
     for (_, o_val) in U_candidate:
-        critical_points.add(t + o_val)
-    
-    for x in sorted(critical_points):
-        total_usage = 0
-        # Ongoing requests: usage = s + (x - p) if x <= p + o, else 0.
-        for (p, o_val) in S.values():
-            if x <= p + o_val:
-                usage = s + (x - p)
-            else:
-                usage = 0
-            total_usage += usage
-        # New candidate requests: usage = s + (x - t) if x <= t + o, else 0.
-        for (_, o_val) in U_candidate:
-            if x <= t + o_val:
-                usage = s + (x - t)
-            else:
-                usage = 0
-            total_usage += usage
-        if total_usage > M:
+        if not engine.try_add(t, o_val):
             return False
     return True
 
-# -------------------------------
-# Online Semi-Online Scheduling
-# -------------------------------
-def online_semi_online_scheduling(M, arrivals, s):
+def _schedule(M, s, jobs):
     """
-    Schedules jobs in an online manner.
-    
-    arrivals: a list of dicts, each with keys:
-       - 'arrival_time': when the job arrives.
-       - 'length': the output length (o) of the job.
-    
-    s: fixed prompt size.
-    
-    Returns:
-      start_times: a dictionary mapping job id to its scheduled start time.
-      total_latency: the sum over jobs of (start time + length - arrival_time).
+    The MC-SF schedule of `jobs`, an iterable of (job_id, arrival_time, length) in order
+    of arrival read as the jobs arrive: yields (job_id, start time, length) for each job
+    as it starts.
     """
-    # Number of jobs.
-    n = len(arrivals)
+    jobs = iter(jobs)
+    next_job = next(jobs, None)  # First job that has not arrived yet
     
-    # Create a list of (job_id, arrival dict) and sort by arrival time.
-    sorted_arrivals = sorted(list(enumerate(arrivals)), key=lambda x: x[1]['arrival_time'])
-    arrival_index = 0  # pointer into sorted_arrivals
-    
-    R = []  # List of available (unscheduled) jobs, each as a tuple (job_id, length)
+    # Available (unscheduled) jobs, each as a tuple (job_id, length), ordered by output
+    # length and then job id to break ties.
+    R = WaitingQueue(key=lambda job: (job[1], job[0]))
     S = {}  # Ongoing scheduled jobs: job_id -> (start time, length)
-    start_times = {}  # To record scheduled start times.
+    completions = []  # Heap of (completion time, job_id) for the jobs in S
+    engine = FeasibilityEngine(M, s)  # Usage of S at its critical points.
     t = 0  # Discrete time counter.
     
     # Continue until all jobs have arrived and been scheduled, and no job is running.
-    while (arrival_index < n) or R or S:
+    while (next_job is not None) or R or S:
         # Add any new arrivals that have arrived by time t.
-        while arrival_index < n and sorted_arrivals[arrival_index][1]['arrival_time'] <= t:
-            job_id, job_info = sorted_arrivals[arrival_index]
-            R.append((job_id, job_info['length']))
-            arrival_index += 1
+        while next_job is not None and next_job[1] <= t:
+            job_id, _, length = next_job
+            R.push((job_id, length))
+            next_job = next(jobs, None)
         
         # Remove finished jobs from ongoing set S.
-        finished = [job_id for job_id, (p, o_val) in S.items() if t >= p + o_val]
-        for job_id in finished:
+        while completions and completions[0][0] <= t:
+            _, job_id = heapq.heappop(completions)
             del S[job_id]
+        engine.release(t)
         
-        # Try to add as many available jobs (from R) as possible.
-        # Sort available jobs by output length (and then job id to break ties).
-        R.sort(key=lambda x: (x[1], x[0]))
+        # Try to add as many available jobs (from R) as possible, shortest first.
         U = []  # Candidate batch to schedule at time t.
-        for candidate in R:
-            U_candidate = U + [candidate]
-            if check_feasible(t, S, U_candidate, M, s):
-                U = U_candidate
+        while R:
+            # Only the candidate's own contribution is evaluated on top of S and U.
+            if engine.try_add(t, R.peek()[1]):
+                U.append(R.pop())
             else:
                 # Cannot add further jobs without violating memory constraint.
                 break
         
         # Schedule all jobs in the candidate batch U with start time = t.
         for (job_id, o_val) in U:
-            start_times[job_id] = t
             S[job_id] = (t, o_val)
-        # Remove scheduled jobs from R.
-        scheduled_ids = {job_id for (job_id, _) in U}
-        R = [job for job in R if job[0] not in scheduled_ids]
-        
-        # Advance time.
-        t += 1
+            heapq.heappush(completions, (t + o_val, job_id))
+            yield job_id, t, o_val
+        # Advance time to the next tick at which something can change: an arrival,
+        # a completion, or the shortest waiting job becoming admissible.
+        t_next = math.inf
+        if next_job is not None:
+            t_next = math.ceil(next_job[1])
+        if completions:
+            t_next = min(t_next, max(completions[0][0], t + 1))
+        if R:
+            t_next = engine.next_admissible(t, R.peek()[1], t_next)
+            if t_next == math.inf:
+                raise ValueError(f"Job {R.peek()[0]} of length {R.peek()[1]} can never fit in memory M={M}")
+        t = t_next
+
+
+# -------------------------------
+# Online Semi-Online Scheduling
+# -------------------------------
+def online_semi_online_scheduling(M, arrivals, s):
+    """
+    Schedules jobs in an online manner.
+    
+    arrivals: a list of dicts, each with keys:
+       - 'arrival_time': when the job arrives.
+       - 'length': the output length (o) of the job.
+    
+    s: fixed prompt size.
+    
+    Returns:
+      start_times: a dictionary mapping job id to its scheduled start time.
+      total_latency: the sum over jobs of (start time + length - arrival_time).
+    """
+    # Sort the jobs by arrival time.
+    sorted_arrivals = sorted(list(enumerate(arrivals)), key=lambda x: x[1]['arrival_time'])
+    jobs = ((job_id, job_info['arrival_time'], job_info['length'])
+            for job_id, job_info in sorted_arrivals)
+    start_times = {job_id: t for job_id, t, _ in _schedule(M, s, jobs)}
     
     # Compute total latency.
     total_latency = 0
@@ -101,3 +224,33 @@ def online_semi_online_scheduling(M, arrivals, s):
         total_latency += latency
     
     return start_times, total_latency
+
+
+def online_semi_online_scheduling_stream(M, chunks, s):
+    """
+    online_semi_online_scheduling for a workload given as an iterable of chunks in order
+    of arrival (traces with 'arrival_time' and 'output' columns, the output being the
+    job length, e.g. from workload.generate_workload). Chunks are read as the jobs
+    arrive and the start times are not kept, so memory is bounded by the jobs waiting
+    or running, whatever the number of jobs.
+    
+    Returns:
+      num_jobs: the number of jobs.
+      total_latency: the sum over jobs of (start time + length - arrival_time).
+    """
+    arrival_time = {}  # Arrival time of the jobs that have arrived and not started
+    
+    def jobs():
+        job_id = 0
+        for chunk in chunks:
+            for arrival, length in zip(chunk['arrival_time'].tolist(), chunk['output'].tolist()):
+                arrival_time[job_id] = arrival
+                yield job_id, arrival, length
+                job_id += 1
+    
+    num_jobs = 0
+    total_latency = 0
+    for job_id, t, o_val in _schedule(M, s, jobs()):
+        total_latency += t + o_val - arrival_time.pop(job_id)
+        num_jobs += 1
+    return num_jobs, total_latency
@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+import workload
+from script_loader import load_script
+from simulator import Simulator
+from sweep import POLICIES
+
+# Parameters of the benchmarked policies (see sweep.POLICIES)
+POLICY_PARAMETERS = {'alpha': 0.2, 'beta': 0.3, 'B': 64, 'seed': 0}
+
+# Benchmark -> (kind, default trace sizes). 'simulator' runs a real-trace policy of
+# policies.py with the Simulator, 'synthetic' the MC-SF scheduler of MC-SF_synthetic.py
+# and 'hindsight' the hindsight IP of Hindsight_IP.py.
+BENCHMARKS = {
+    'MC-SF': ('simulator', (2000, 8000, 32000)),
+    'MC-Benchmark': ('simulator', (2000, 8000, 32000)),
+    'alpha-greedy': ('simulator', (2000, 8000, 32000)),
+    'alpha-beta': ('simulator', (2000, 8000, 32000)),
+    'MC-SF synthetic': ('synthetic', (2000, 8000, 32000)),
+    'hindsight IP': ('hindsight', (25, 50, 100)),
+}
+
+# Real-trace workload: Poisson arrivals, prompt and output lengths in tokens
+SIMULATOR_WORKLOAD = dict(arrivals=workload.Poisson(2.5),
+                          input_lengths=workload.Uniform(10, 400),
+                          output_lengths=workload.LogNormal(100, 0.8, 1000))
+SIMULATOR_M = 20000
+
+# Synthetic workload (whole time steps): arrival times are rounded down
+SYNTHETIC_WORKLOAD = dict(arrivals=workload.Poisson(0.5),
+                          input_lengths=workload.Uniform(1, 1),
+                          output_lengths=workload.Uniform(1, 20))
+SYNTHETIC_M = 100
+SYNTHETIC_S = 2
+
+
+def run_benchmark(names=tuple(BENCHMARKS), sizes=None, seed=0, backend='highs',
+                  hindsight_sizes=None):
+    """
+    Runs each benchmark of `names` on fixed-seed synthetic traces of increasing size and
+    returns one dict per run with:
+      - wall_time: seconds spent in the scheduler (trace generation excluded);
+      - events_per_second: arrivals plus batches (the Simulator events; for the
+        synthetic scheduler and the hindsight IP, arrivals plus job starts) per second;
+      - batches_per_second: batches per second (distinct start times for the
+        synthetic scheduler and the hindsight IP);
+      - peak_rss_mb: peak resident memory of the process that ran it;
+      - result: the average latency (total latency for the synthetic scheduler and the
+        hindsight IP), which must not change with the speed of the code.
+    `sizes` overrides the default sizes of the simulator and synthetic benchmarks, and
+    `hindsight_sizes` those of the hindsight IP, which is solved with `backend` (see
+    Hindsight_IP.solve_MILP_online): its solve time and memory grow much faster with the
+    size, so it is not run on the sizes of the others. Every run is a fresh process, so
+    that the peak memory is its own.
+    """
+    def sizes_of(name):
+        override = hindsight_sizes if BENCHMARKS[name][0] == 'hindsight' else sizes
+        return override or BENCHMARKS[name][1]
+
+    runs = [(name, size) for name in names for size in sizes_of(name)]
+    results = []
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for name, size in runs:
+            results.append(pool.apply(_run_one, (name, size, seed, backend)))
+    return results
+
+
+def scaling_exponents(results):
+    """
+    Exponent k of wall_time ~ size^k for each benchmark, fitted by least squares on the
+    logarithms (needs at least two sizes).
+    """
+    exponents = {}
+    for name in dict.fromkeys(result['name'] for result in results):
+        runs = [result for result in results if result['name'] == name]
+        if len(runs) >= 2:
+            sizes = np.log([result['size'] for result in runs])
+            times = np.log([max(result['wall_time'], 1e-9) for result in runs])
+            exponents[name] = float(np.polyfit(sizes, times, 1)[0])
+    return exponents
+
+
+def save_baseline(path, results, results_only=False):
+    """
+    Writes `results` as a baseline. With `results_only`, the throughput and memory
+    figures, which only hold on the machine that measured them, are left out: only the
+    results and the scaling exponents are compared against such a baseline.
+    """
+    exponents = scaling_exponents(results)
+    if results_only:
+        results = [{key: run[key] for key in ('name', 'size', 'result')} for run in results]
+    with open(path, 'w') as f:
+        json.dump({'results': results, 'scaling_exponents': exponents}, f, indent=2)
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, exponent_tolerance=0.2):
+    """
+    Regressions of `results` against `baseline` (a dict as written by save_baseline),
+    as a list of messages (empty if there are none):
+      - throughput: events per second below (1 - tolerance) times the baseline;
+      - memory: peak RSS above (1 + tolerance) times the baseline;
+      - scaling: an exponent more than `exponent_tolerance` above the baseline;
+      - results: a different result, i.e. the scheduler no longer does the same.
+    Runs that are not in the baseline are ignored, and so are throughput and memory when
+    the baseline has none (see save_baseline).
+    """
+    reference = {(run['name'], run['size']): run for run in baseline['results']}
+    regressions = []
+    for run in results:
+        key = (run['name'], run['size'])
+        if key not in reference:
+            continue
+        base = reference[key]
+        label = f"{run['name']} (n={run['size']})"
+        if ('events_per_second' in base
+                and run['events_per_second'] < (1 - tolerance) * base['events_per_second']):
+            regressions.append(f"{label}: {run['events_per_second']:.0f} events/s, "
+                               f"baseline {base['events_per_second']:.0f}")
+        if 'peak_rss_mb' in base and run['peak_rss_mb'] > (1 + tolerance) * base['peak_rss_mb']:
+            regressions.append(f"{label}: peak RSS {run['peak_rss_mb']:.1f} MB, "
+                               f"baseline {base['peak_rss_mb']:.1f}")
+        if not _same_result(run['result'], base['result']):
+            regressions.append(f"{label}: result {run['result']!r}, baseline {base['result']!r}")
+    base_exponents = baseline.get('scaling_exponents', {})
+    for name, exponent in scaling_exponents(results).items():
+        if name in base_exponents and exponent > base_exponents[name] + exponent_tolerance:
+            regressions.append(f"{name}: scaling exponent {exponent:.2f}, "
+                               f"baseline {base_exponents[name]:.2f}")
+    return regressions
+
+
+def _same_result(result, reference):
+    if result is None or reference is None:
+        return result is reference
+    return math.isclose(result, reference, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def _trace(kind, size, seed):
+    parameters = SIMULATOR_WORKLOAD if kind == 'simulator' else SYNTHETIC_WORKLOAD
+    return next(workload.generate_workload(size, chunk_size=size, seed=seed, **parameters))
+
+
+def _run_one(name, size, seed, backend):
+    kind = BENCHMARKS[name][0]
+    trace = _trace(kind, size, seed)
+    if kind == 'simulator':
+        policy = POLICIES[name][0](POLICY_PARAMETERS)
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            sim = Simulator(trace, policy, SIMULATOR_M).run()
+        wall_time = time.perf_counter() - start
+        num_events = sim.num_arrivals + sim.num_batches
+        num_batches = sim.num_batches
+        result = sim.average_latency() if sim.num_completed else None
+    else:
+        arrivals = [{'arrival_time': math.floor(t), 'length': o} for t, o in
+                    zip(trace['arrival_time'].tolist(), trace['output'].tolist())]
+        start = time.perf_counter()
+        if kind == 'synthetic':
+            scheduler = load_script('MC-SF_synthetic.py')
+            start_times, result = scheduler.online_semi_online_scheduling(
+                SYNTHETIC_M, arrivals, SYNTHETIC_S)
+        else:
+            hindsight = load_script('Hindsight_IP.py')
+            result, start_times = hindsight.solve_MILP_online(
+                SYNTHETIC_M, arrivals, SYNTHETIC_S, backend=backend)
+        wall_time = time.perf_counter() - start
+        start_times = start_times or {}
+        num_events = len(arrivals) + len(start_times)
+        num_batches = len(set(start_times.values()))
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+    return {'name': name, 'size': size,
+            'wall_time': wall_time,
+            'events_per_second': num_events / wall_time,
+            'batches_per_second': num_batches / wall_time,
+            'peak_rss_mb': peak_rss_mb,
+            'result': result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the schedulers")
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        help="trace sizes of the simulator and synthetic benchmarks (default: per benchmark)")
+    parser.add_argument('--hindsight-sizes', nargs='+', type=int,
+                        help="trace sizes of the hindsight IP (default: %(default)s)",
+                        default=list(BENCHMARKS['hindsight IP'][1]))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default='highs', help="MILP backend of the hindsight IP")
+    parser.add_argument('--baseline', help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', help="writes the results as a baseline JSON")
+    parser.add_argument('--results-only', action='store_true',
+                        help="leaves the machine-specific throughput and memory out of the saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.benchmarks, args.sizes, args.seed, args.backend, args.hindsight_sizes)
+    print(f"{'benchmark':<16} {'size':>7} {'time (s)':>9} {'events/s':>10} {'batches/s':>10} {'RSS (MB)':>9}")
+    for run in results:
+        print(f"{run['name']:<16} {run['size']:>7} {run['wall_time']:>9.3f} {run['events_per_second']:>10.0f} "
+              f"{run['batches_per_second']:>10.0f} {run['peak_rss_mb']:>9.1f}")
+    for name, exponent in scaling_exponents(results).items():
+        print(f"{name}: time ~ n^{exponent:.2f}")
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, args.results_only)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:", *regressions, sep="\n  ", file=sys.stderr)
+            return 1
+        print("No regression against", args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
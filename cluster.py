@@ -0,0 +1,389 @@
+import collections
+import math
+import multiprocessing
+
+import numpy as np
+
+from memory_envelope import MemoryEnvelope
+from simulator import ArrivalCursor, Simulator
+
+
+class ReplicaArrivals(ArrivalCursor):
+    """
+    The arrivals routed to one replica, in the order the router sends them. A request
+    routed after the replica's clock has passed its arrival time (the replica idled
+    past the synchronization point) is delivered at `delivery_time`, but its latency
+    still counts from its arrival time. Request ids are local to the replica.
+    """
+
+    def __init__(self):
+        self.source = None
+        self.num_routed = 0
+        self._queue = collections.deque()  # (request id, delivery time, arrival time, input, output)
+        self.next_time = math.inf
+
+    def __len__(self):
+        return self.num_routed
+
+    def __deepcopy__(self, memo):
+        copied = ReplicaArrivals()
+        copied.num_routed = self.num_routed
+        copied._queue = collections.deque(self._queue)
+        copied.next_time = self.next_time
+        return copied
+
+    def push(self, delivery_time, arrival_time, input_size, output_size):
+        if not self._queue:
+            self.next_time = delivery_time
+        self._queue.append((self.num_routed, delivery_time, arrival_time, input_size, output_size))
+        self.num_routed += 1
+
+    def pop(self):
+        request_id, _, arrival_time, input_size, output_size = self._queue.popleft()
+        self.next_time = self._queue[0][1] if self._queue else math.inf
+        return request_id, arrival_time, input_size, output_size
+
+    def extend(self, trace):
+        """
+        Routes the rows of `trace` beyond the ones routed so far to this replica, in order
+        of arrival time, as ArrivalCursor.extend continues a trace with them.
+        """
+        arrival_time = np.asarray(trace['arrival_time'])[self.num_routed:]
+        input_size = np.asarray(trace['input'])[self.num_routed:]
+        output_size = np.asarray(trace['output'])[self.num_routed:]
+        for row in np.argsort(arrival_time, kind='stable').tolist():
+            t = arrival_time[row].item()
+            self.push(t, t, input_size[row].item(), output_size[row].item())
+
+
+class ReplicaStatus:
+    """
+    What the router knows of a replica: its state at the last synchronization point,
+    plus the requests routed to it since then (see `assign`).
+      - time: the clock of the replica;
+      - memory_in_use: memory held by its running requests, plus the prompts routed to it;
+      - lookahead_peak: the peak memory of its resident requests over their remaining
+        tokens, as computed by the MC-SF lookahead;
+      - num_waiting, waiting_tokens: requests waiting for admission and their prompt
+        and output tokens;
+      - num_running: requests being processed.
+    """
+
+    def __init__(self, index, M, time=0.0, memory_in_use=0, lookahead_peak=0, num_waiting=0,
+                 waiting_tokens=0, num_running=0):
+        self.index = index
+        self.M = M
+        self.time = time
+        self.memory_in_use = memory_in_use
+        self.lookahead_peak = lookahead_peak
+        self.num_waiting = num_waiting
+        self.waiting_tokens = waiting_tokens
+        self.num_running = num_running
+
+    def assign(self, input_size, output_size):
+        self.num_waiting += 1
+        self.waiting_tokens += input_size + output_size
+        self.memory_in_use += input_size
+
+
+# -------------------------------
+# Routers
+# -------------------------------
+class Router:
+    """
+    Placement of arriving requests on the replicas: `route(replicas, input_size,
+    output_size)` returns the index of the replica, given the ReplicaStatus of every
+    replica. The lookahead_peak of the statuses is only computed for routers with
+    `uses_lookahead`, and routers without `uses_status` (which ignore the replicas)
+    route the whole trace at once.
+    """
+
+    uses_status = True
+    uses_lookahead = False
+
+    def route(self, replicas, input_size, output_size):
+        raise NotImplementedError
+
+
+class RoundRobin(Router):
+    """Replicas in turn, whatever their state."""
+
+    uses_status = False
+
+    def __init__(self):
+        self.next_replica = 0
+
+    def route(self, replicas, input_size, output_size):
+        index = self.next_replica
+        self.next_replica = (index + 1) % len(replicas)
+        return index
+
+
+class LeastMemory(Router):
+    """The replica with the least memory in use (first one on ties)."""
+
+    def route(self, replicas, input_size, output_size):
+        return min(replicas, key=lambda replica: replica.memory_in_use).index
+
+
+class ShortestExpectedQueue(Router):
+    """
+    The replica where the request is expected to wait the least, in tokens of work
+    ahead of it: the tokens of the requests already waiting there, plus the memory the
+    MC-SF lookahead says must be released before the request fits. Ties, e.g. between
+    replicas where it would start at once, go to the least memory in use.
+    """
+
+    uses_lookahead = True
+
+    def route(self, replicas, input_size, output_size):
+        def expected_queue(replica):
+            shortfall = replica.lookahead_peak + input_size + output_size + 1 - replica.M
+            return replica.waiting_tokens + max(shortfall, 0), replica.memory_in_use
+        return min(replicas, key=expected_queue).index
+
+
+ROUTERS = {
+    'round-robin': RoundRobin,
+    'least-memory': LeastMemory,
+    'shortest-queue': ShortestExpectedQueue,
+}
+
+
+# -------------------------------
+# Replicas
+# -------------------------------
+class Replica:
+    """One machine of the cluster: a Simulator fed with the requests routed to it."""
+
+    def __init__(self, index, policy, M, time_limit):
+        self.index = index
+        self.arrivals = ReplicaArrivals()
+        self.sim = Simulator(self.arrivals, policy(), M, time_limit=time_limit)
+
+    def advance(self, routed, until, lookahead):
+        """Delivers the routed requests and simulates up to `until`; returns the new status."""
+        for request in routed:
+            self.arrivals.push(*request)
+        self.sim.run(until)
+        return self.status(lookahead)
+
+    def status(self, lookahead=True):
+        """
+        The ReplicaStatus of the replica. It is taken at every synchronization point, and
+        costs a few array operations over the slots of the RequestStore (the requests in
+        the system), with no Python work per request.
+        """
+        sim = self.sim
+        requests = sim.requests
+        n = requests.num_slots
+        live = np.ones(n, dtype=bool)
+        live[requests.free_slots] = False
+        running = live & requests.started[:n]
+        waiting = live & ~running
+        input_size, output_size = requests.input_size[:n], requests.output_size[:n]
+        lookahead_peak = 0
+        if lookahead:
+            envelope = getattr(sim.policy, 'envelope', None)
+            if isinstance(envelope, MemoryEnvelope):
+                lookahead_peak = envelope.peak()
+            else:
+                # Policies without the MC-SF lookahead: compute it for the running requests
+                lookahead_peak = _lookahead_peak(input_size[running], output_size[running],
+                                                 requests.tokens_processed[:n][running])
+        return ReplicaStatus(
+            self.index, sim.M, time=sim.current_time,
+            memory_in_use=sim.memory_in_use(),
+            lookahead_peak=lookahead_peak,
+            num_waiting=int(waiting.sum()),
+            waiting_tokens=int(input_size[waiting].sum() + output_size[waiting].sum()),
+            num_running=int(running.sum()))
+
+    def result(self):
+        sim = self.sim
+        return {
+            'replica': self.index,
+            'num_arrivals': sim.num_arrivals,
+            'num_completed': sim.num_completed,
+            'average_latency': sim.average_latency() if sim.num_completed else math.nan,
+            'memory_resets': sim.memory_resets,
+            'num_batches': sim.num_batches,
+            'stopped': sim.stopped,
+            'telemetry': sim.telemetry,
+        }
+
+
+def _lookahead_peak(input_size, output_size, tokens_processed):
+    """
+    The peak of a MemoryEnvelope holding the given requests (see MemoryEnvelope.add), with
+    array operations: a request ends E = output_size + 1 - tokens_processed batches from
+    now, and the memory at step E is the sum of input_size + tokens_processed + E over the
+    requests that end at E or later.
+    """
+    if not len(input_size):
+        return 0
+    ends = output_size.astype(np.int64) + 1 - tokens_processed
+    order = np.argsort(-ends, kind='stable')
+    ends = ends[order]
+    held = np.cumsum(input_size[order].astype(np.int64) + tokens_processed[order])
+    memory = held + ends * np.arange(1, len(ends) + 1)
+    # With the latest ends first, the memory at E is at the last request ending at E
+    last = np.append(ends[1:] != ends[:-1], True)
+    return int(memory[last].max())
+
+
+def _replica_worker(connection, indices, policy, M, time_limit):
+    """Worker process owning the replicas `indices`: advances them on request."""
+    replicas = {index: Replica(index, policy, M, time_limit) for index in indices}
+    while True:
+        command, routed, until, lookahead = connection.recv()
+        if command == 'advance':
+            connection.send([replicas[index].advance(routed[index], until, lookahead)
+                             for index in indices])
+        else:
+            connection.send([replicas[index].result() for index in indices])
+            return
+
+
+class Cluster:
+    """
+    N replicas behind a router. Each replica is a Simulator with its own instance of
+    the policy (`policy` is a picklable callable returning a fresh Policy, e.g. MCSF or
+    functools.partial(AlphaGreedy, 0.2, 64)) and its own memory M; `router` is a
+    Router or the name of one in ROUTERS.
+
+    Replicas only interact through the router, so they are simulated independently
+    between synchronization points (conservative synchronization): at each point
+    every replica has been simulated up to it, the router places the arrivals of the
+    next interval using the replica states at that point, and the replicas advance to
+    the next point. With `sync_interval` None, the points are the arrival times and
+    the router sees the state of every replica when each request arrives; with an
+    interval of Δ seconds it sees states up to Δ old, like a load balancer with
+    periodic load reports, and the replicas run longer between points. With
+    `processes`, the replicas are spread over that many worker processes and simulated
+    in parallel between points.
+
+    Each point costs a round trip to every worker, so the processes only pay off when
+    the replicas run long between points: with a sync_interval, or with a router that
+    ignores the replica states (round-robin), whose arrivals are routed by blocks of
+    ROUTING_BLOCK with no point in between. With sync_interval None and another router,
+    there is one round trip per arrival, and processes are usually slower than
+    simulating the replicas in this process.
+    """
+
+    ROUTING_BLOCK = 1 << 16
+
+    def __init__(self, policy, num_replicas, M, router='round-robin', time_limit=math.inf,
+                 sync_interval=None, processes=None):
+        self.policy = policy
+        self.num_replicas = num_replicas
+        self.M = M
+        self.router = ROUTERS[router]() if isinstance(router, str) else router
+        self.time_limit = time_limit
+        self.sync_interval = sync_interval
+        self.processes = processes
+        self.replica_results = None
+
+    def run(self, trace):
+        """Simulates `trace` on the cluster; results are in `replica_results`."""
+        arrivals = ArrivalCursor(trace)
+        statuses = [ReplicaStatus(index, self.M) for index in range(self.num_replicas)]
+        advance, finish, close = self._start_replicas()
+        try:
+            point = self._next_point(arrivals.next_time, -math.inf)
+            while point < math.inf:
+                routed = [[] for _ in range(self.num_replicas)]
+                if self.router.uses_status:
+                    # Route the arrivals before the next synchronization point (with
+                    # sync_interval None, the ones at this point), using the replica
+                    # states at this one
+                    end = point if self.sync_interval is None else point + self.sync_interval
+                    while arrivals.next_time < end or arrivals.next_time == point:
+                        self._route(arrivals.pop(), statuses, routed)
+                    point = self._next_point(arrivals.next_time, end)
+                else:
+                    # The routing ignores the replica states: only pause the replicas
+                    # every ROUTING_BLOCK arrivals, to bound the requests held in `routed`
+                    for _ in range(self.ROUTING_BLOCK):
+                        if arrivals.next_time == math.inf:
+                            break
+                        self._route(arrivals.pop(), statuses, routed)
+                    point = arrivals.next_time
+                statuses = advance(routed, point)
+            self.replica_results = finish()
+        finally:
+            close()
+        return self
+
+    def _route(self, arrival, statuses, routed):
+        _, arrival_time, input_size, output_size = arrival
+        index = self.router.route(statuses, input_size, output_size)
+        statuses[index].assign(input_size, output_size)
+        routed[index].append((max(arrival_time, statuses[index].time), arrival_time,
+                              input_size, output_size))
+
+    def _next_point(self, next_arrival, end):
+        """First synchronization point at or after `end` where some request arrives."""
+        if self.sync_interval is None or next_arrival == math.inf:
+            return next_arrival
+        return max(end, next_arrival // self.sync_interval * self.sync_interval)
+
+    def _start_replicas(self):
+        """Returns advance(routed, until) -> statuses, finish() -> results and close()."""
+        lookahead = self.router.uses_lookahead
+        if not self.processes:
+            replicas = [Replica(index, self.policy, self.M, self.time_limit)
+                        for index in range(self.num_replicas)]
+
+            def advance(routed, until):
+                return [replica.advance(routed[replica.index], until, lookahead)
+                        for replica in replicas]
+
+            def finish():
+                return [replica.result() for replica in replicas]
+            return advance, finish, lambda: None
+
+        workers = []
+        for worker in range(min(self.processes, self.num_replicas)):
+            indices = list(range(worker, self.num_replicas, self.processes))
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_replica_worker,
+                args=(child_connection, indices, self.policy, self.M, self.time_limit),
+                daemon=True)
+            process.start()
+            workers.append((process, connection, indices))
+
+        def send(command, routed=None, until=None):
+            # Every worker gets the command before any reply is awaited, so they run in parallel
+            for _, connection, _ in workers:
+                connection.send((command, routed, until, lookahead))
+            replies = [None] * self.num_replicas
+            for _, connection, indices in workers:
+                for index, reply in zip(indices, connection.recv()):
+                    replies[index] = reply
+            return replies
+
+        def close():
+            for process, _, _ in workers:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        return (lambda routed, until: send('advance', routed, until),
+                lambda: send('finish'), close)
+
+    # -------------------------------
+    # Results
+    # -------------------------------
+    @property
+    def num_completed(self):
+        return sum(result['num_completed'] for result in self.replica_results)
+
+    def average_latency(self):
+        """Average latency of the completed requests over the whole cluster (nan if none)."""
+        if not self.num_completed:
+            return math.nan
+        total = sum(result['average_latency'] * result['num_completed']
+                    for result in self.replica_results if result['num_completed'])
+        return total / self.num_completed
@@ -0,0 +1,58 @@
+import heapq
+
+import numpy as np
+
+
+# Victim policy -> priority of the running requests (given by slot), lowest evicted first
+VICTIM_POLICIES = {
+    # Least decode work lost
+    'fewest-tokens': lambda requests, slots: requests.tokens_processed[slots],
+    # Most memory freed per output token to process again
+    'memory-per-work': lambda requests, slots: -(
+        (requests.input_size[slots] + requests.tokens_processed[slots])
+        / np.maximum(requests.tokens_processed[slots], 1)),
+    # Newest requests first, as a LIFO preemption would
+    'latest-arrival': lambda requests, slots: -requests.arrival_time[slots],
+}
+
+
+class Evictor:
+    """
+    Victim selection on memory overflow: instead of resetting every running request,
+    or a random subset of them, reset just enough of them to bring the memory in use
+    back within M, in the order of `victim_policy` (see VICTIM_POLICIES; ties go to the
+    most recent request).
+
+    The priorities change with every batch (tokens processed grow), so they are not
+    kept up to date between overflows: on overflow, the running requests are put in a
+    binary heap keyed by their current priority in O(n), and victims are popped from it
+    in O(log n) each until enough memory is freed.
+
+    The discarded work is reported by the Simulator: `requests_reset` and
+    `wasted_tokens` (output tokens processed by the reset requests, which will be
+    processed again).
+    """
+
+    def __init__(self, victim_policy='fewest-tokens'):
+        if victim_policy not in VICTIM_POLICIES:
+            raise ValueError(f"Unknown victim policy: {victim_policy}")
+        self.victim_policy = victim_policy
+
+    def select(self, sim):
+        """Running requests to reset so that the memory in use is at most M."""
+        excess = sim.memory_in_use() - sim.M
+        if excess <= 0 or not sim.running_requests:
+            return []
+        requests = sim.requests
+        slots = np.fromiter(sim.running_requests, dtype=np.int64, count=len(sim.running_requests))
+        priorities = VICTIM_POLICIES[self.victim_policy](requests, slots)
+        freed = requests.input_size[slots].astype(np.int64) + requests.tokens_processed[slots]
+        heap = list(zip(priorities.tolist(), (-requests.request_id[slots]).tolist(),
+                        slots.tolist(), freed.tolist()))
+        heapq.heapify(heap)
+        victims = []
+        while excess > 0:
+            _, _, slot, memory = heapq.heappop(heap)
+            victims.append(slot)
+            excess -= memory
+        return victims
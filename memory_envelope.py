@@ -0,0 +1,345 @@
+import heapq
+
+NEG_INF = float('-inf')
+INF = float('inf')
+
+
+class MemoryEnvelope:
+    """
+    Persistent memory envelope for the MC-SF admission lookahead.
+
+    The lookahead assumes every resident request produces one token per batch, so a
+    request with `remaining` tokens left finishes exactly `remaining` batches from now.
+    We count batch completions in `step` and key every request by its absolute
+    completion step E = step + remaining, which no longer changes as batches complete.
+    Likewise b = input_size + tokens_processed - step is invariant, and the memory in
+    use at a future step K is
+
+        mem(K) = sum over requests with E >= K of (b + K).
+
+    mem only needs to be checked at the completion steps E (it grows between them),
+    so the envelope keeps one leaf per absolute step holding mem(K) for the steps where
+    some request ends. Admitting a request (E_c, b_c) adds b_c + K to every leaf with
+    K <= E_c, i.e. a range add whose amount grows linearly with the leaf's step. This
+    is the "heaten" operation of a kinetic segment tree: each node stores its maximum
+    line and the amount of heat after which another line overtakes it, which gives
+    amortized O(log^2 n) updates and O(1) peak queries. Fenwick trees over the same
+    steps hold the suffix sums of b and of the request count, so a fresh leaf is
+    initialised in O(log n).
+
+    Rejected admissions are undone through a journal of node writes instead of
+    rebuilding anything.
+    """
+
+    def __init__(self, M, capacity=1024):
+        self.M = M
+        self.step = 0  # Number of batch completions so far
+        self._ends = {}  # Absolute completion step -> [sum of b, number of requests]
+        self._end_heap = []  # Completion steps in _ends, smallest first
+        self._stale_ends = set()  # Steps still in _end_heap but no longer in _ends
+        self._journal = None
+        self._reset(1, capacity)
+
+    # -------------------------------
+    # Public interface
+    # -------------------------------
+    def __len__(self):
+        return sum(count for _, count in self._ends.values())
+
+    def peak(self):
+        """Peak memory over all remaining completion steps of the resident requests."""
+        top = self._val[1]
+        return 0 if top == NEG_INF else top
+
+    def add(self, input_size, output_size, tokens_processed=0):
+        """Make a request resident without checking the memory limit."""
+        remaining = output_size + 1 - tokens_processed
+        end = self.step + remaining
+        self._ensure_capacity(end)
+        self._insert(end, input_size + tokens_processed - self.step)
+
+    def admit(self, input_size, output_size, tokens_processed=0):
+        """
+        Tentatively adds a request and keeps it only if the peak memory stays within M.
+        Returns True if the request was admitted.
+        """
+        remaining = output_size + 1 - tokens_processed
+        end = self.step + remaining
+        self._ensure_capacity(end)
+        self._journal = []
+        self._insert(end, input_size + tokens_processed - self.step)
+        admitted = self.peak() <= self.M
+        if not admitted:
+            self._rollback()
+        self._journal = None
+        return admitted
+
+    def admit_prefix(self, candidates):
+        """
+        Admits the longest prefix of `candidates`, an iterable of (input_size, output_size)
+        pairs for new prompts, whose addition keeps the peak memory within M.
+
+        Admission is monotone (dropping a request never raises the envelope), so the
+        prefix is found by galloping over doubling chunks and then bisecting inside the
+        first chunk that does not fit. This takes O(log k) peak checks for k admitted
+        prompts, and candidates are read lazily: at most 2k + 1 of them are consumed.
+        Returns the number of admitted prompts.
+        """
+        candidates = iter(candidates)
+        buffer = []
+        admitted = 0
+        chunk = 1
+        while True:
+            while len(buffer) < admitted + chunk:
+                nxt = next(candidates, None)
+                if nxt is None:
+                    break
+                buffer.append(nxt)
+            hi = min(len(buffer), admitted + chunk)
+            if hi == admitted:
+                return admitted  # All candidates admitted
+            if self._try_insert(buffer, admitted, hi):
+                admitted = hi
+                chunk *= 2
+                continue
+            # The longest feasible prefix ends inside [admitted, hi).
+            while hi - admitted > 1:
+                mid = (admitted + hi) // 2
+                if self._try_insert(buffer, admitted, mid):
+                    admitted = mid
+                else:
+                    hi = mid
+            return admitted
+
+    def peak_with(self, input_size, output_size, tokens_processed=0):
+        """Peak memory if the request were added, leaving the envelope unchanged."""
+        remaining = output_size + 1 - tokens_processed
+        end = self.step + remaining
+        self._ensure_capacity(end)
+        self._journal = []
+        self._insert(end, input_size + tokens_processed - self.step)
+        peak = self.peak()
+        self._rollback()
+        self._journal = None
+        return peak
+
+    def advance(self, steps=1):
+        """Records `steps` batch completions and drops the requests that finished."""
+        self.step += steps
+        while self._end_heap and self._end_heap[0] <= self.step:
+            end = heapq.heappop(self._end_heap)
+            if end in self._stale_ends:
+                self._stale_ends.discard(end)
+                continue
+            b_sum, count = self._ends.pop(end)
+            j = end - self._base
+            self._set_leaf(j, NEG_INF)
+            self._fenwick_add(j, -b_sum, -count)
+
+    # -------------------------------
+    # Kinetic segment tree
+    # -------------------------------
+    def _reset(self, base, size):
+        cap = 1
+        while cap < size:
+            cap *= 2
+        self._base = base
+        self._size = cap
+        self._val = [NEG_INF] * (2 * cap)
+        self._arg = [0] * (2 * cap)
+        self._melt = [INF] * (2 * cap)
+        self._add = [0] * (2 * cap)
+        self._heat = [0] * (2 * cap)
+        self._fen_b = [0] * (cap + 1)
+        self._fen_n = [0] * (cap + 1)
+        self._total_b = 0
+        self._total_n = 0
+
+    def _ensure_capacity(self, end):
+        if end < self._base + self._size:
+            return
+        # Slide the window to start after the current step and grow it if needed,
+        # then rebuild the leaves from the resident requests.
+        base = self.step + 1
+        size = self._size
+        while end >= base + size // 2:
+            size *= 2
+        self._reset(base, size)
+        suffix_b = 0
+        suffix_n = 0
+        for end_step in sorted(self._ends, reverse=True):
+            b_sum, count = self._ends[end_step]
+            suffix_b += b_sum
+            suffix_n += count
+            j = end_step - base
+            leaf = self._size + j
+            self._val[leaf] = suffix_b + end_step * suffix_n
+            self._fenwick_add(j, b_sum, count)
+        for j in range(self._size):
+            self._arg[self._size + j] = base + j
+        for i in range(self._size - 1, 0, -1):
+            self._pull(i)
+
+    def _try_insert(self, prompts, lo, hi):
+        # Inserts prompts[lo:hi] and keeps them only if the peak stays within M.
+        self._ensure_capacity(self.step + max(output_size for _, output_size in prompts[lo:hi]) + 1)
+        self._journal = []
+        for input_size, output_size in prompts[lo:hi]:
+            self._insert(self.step + output_size + 1, input_size - self.step)
+        fits = self.peak() <= self.M
+        if not fits:
+            self._rollback()
+        self._journal = None
+        return fits
+
+    def _insert(self, end, b):
+        j = end - self._base
+        if end not in self._ends:
+            # Memory at this step before the new request: suffix sums over E >= end.
+            b_before, n_before = self._fenwick_prefix(j - 1)
+            self._set_leaf(j, (self._total_b - b_before) + end * (self._total_n - n_before))
+        self._heat_prefix(j, b)
+        self._fenwick_add(j, b, 1)
+        entry = self._ends.get(end)
+        if entry is None:
+            self._ends[end] = [b, 1]
+            if end in self._stale_ends:
+                self._stale_ends.discard(end)  # Its heap entry is still there
+            else:
+                heapq.heappush(self._end_heap, end)
+            if self._journal is not None:
+                self._journal.append(('new', end, b))
+        else:
+            entry[0] += b
+            entry[1] += 1
+            if self._journal is not None:
+                self._journal.append(('inc', end, b))
+
+    def _rollback(self):
+        journal = self._journal
+        self._journal = None
+        for entry in reversed(journal):
+            kind = entry[0]
+            if kind == 'node':
+                _, i, v, x, melt, add, heat = entry
+                self._val[i] = v
+                self._arg[i] = x
+                self._melt[i] = melt
+                self._add[i] = add
+                self._heat[i] = heat
+            elif kind == 'fen':
+                _, j, b, count = entry
+                self._fenwick_add(j, -b, -count)
+            elif kind == 'new':
+                _, end, _ = entry
+                del self._ends[end]
+                # Lazy deletion: the step is skipped when popped from the heap, which
+                # is only rebuilt once most of its entries are stale
+                self._stale_ends.add(end)
+                if len(self._stale_ends) > len(self._end_heap) // 2:
+                    self._end_heap = [e for e in self._end_heap if e not in self._stale_ends]
+                    heapq.heapify(self._end_heap)
+                    self._stale_ends.clear()
+            else:
+                _, end, b = entry
+                self._ends[end][0] -= b
+                self._ends[end][1] -= 1
+
+    def _write(self, i, v, x, melt, add, heat):
+        if self._journal is not None:
+            self._journal.append(
+                ('node', i, self._val[i], self._arg[i], self._melt[i], self._add[i], self._heat[i]))
+        self._val[i] = v
+        self._arg[i] = x
+        self._melt[i] = melt
+        self._add[i] = add
+        self._heat[i] = heat
+
+    def _pull(self, i):
+        val = self._val
+        arg = self._arg
+        left, right = 2 * i, 2 * i + 1
+        # Ties go to the right child: its line has the larger step, so it keeps
+        # winning under any positive heat.
+        if val[left] > val[right]:
+            v, x, lose_v, lose_x = val[left], arg[left], val[right], arg[right]
+        else:
+            v, x, lose_v, lose_x = val[right], arg[right], val[left], arg[left]
+        melt = min(self._melt[left], self._melt[right])
+        if lose_v != NEG_INF and lose_x > x:
+            melt = min(melt, (v - lose_v) / (lose_x - x))
+        self._write(i, v, x, melt, 0, 0)
+
+    def _apply(self, i, add, heat):
+        v = self._val[i]
+        if v == NEG_INF:
+            return  # No resident request below this node
+        if i >= self._size:
+            self._write(i, v + add + heat * self._arg[i], self._arg[i], INF, 0, 0)
+        elif heat < self._melt[i]:
+            self._write(i, v + add + heat * self._arg[i], self._arg[i], self._melt[i] - heat,
+                        self._add[i] + add, self._heat[i] + heat)
+        else:
+            # The maximum changes hands inside this node: push down and recompute.
+            self._push(i)
+            self._apply(2 * i, add, heat)
+            self._apply(2 * i + 1, add, heat)
+            self._pull(i)
+
+    def _push(self, i):
+        add, heat = self._add[i], self._heat[i]
+        if add or heat:
+            self._apply(2 * i, add, heat)
+            self._apply(2 * i + 1, add, heat)
+            self._write(i, self._val[i], self._arg[i], self._melt[i], 0, 0)
+
+    def _heat_prefix(self, j, b):
+        # Add b + K to every leaf K in [0, j].
+        self._heat_range(1, 0, self._size, j + 1, b)
+
+    def _heat_range(self, i, lo, hi, r, b):
+        if r <= lo:
+            return
+        if hi <= r:
+            self._apply(i, b, 1)
+            return
+        self._push(i)
+        mid = (lo + hi) // 2
+        self._heat_range(2 * i, lo, mid, r, b)
+        self._heat_range(2 * i + 1, mid, hi, r, b)
+        self._pull(i)
+
+    def _set_leaf(self, j, v):
+        leaf = self._size + j
+        for shift in range(self._size.bit_length() - 1, 0, -1):
+            self._push(leaf >> shift)
+        self._write(leaf, v, self._base + j, INF, 0, 0)
+        i = leaf >> 1
+        while i:
+            self._pull(i)
+            i >>= 1
+
+    # -------------------------------
+    # Fenwick trees over completion steps
+    # -------------------------------
+    def _fenwick_add(self, j, b, count):
+        if self._journal is not None:
+            self._journal.append(('fen', j, b, count))
+        self._total_b += b
+        self._total_n += count
+        i = j + 1
+        while i <= self._size:
+            self._fen_b[i] += b
+            self._fen_n[i] += count
+            i += i & -i
+
+    def _fenwick_prefix(self, j):
+        # Sums over leaves [0, j].
+        b_sum = 0
+        count = 0
+        i = j + 1
+        while i > 0:
+            b_sum += self._fen_b[i]
+            count += self._fen_n[i]
+            i -= i & -i
+        return b_sum, count
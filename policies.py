@@ -0,0 +1,169 @@
+import math
+import random
+
+from eviction import Evictor
+from memory_envelope import MemoryEnvelope
+from simulator import Policy
+
+
+class MCSF(Policy):
+    """
+    MC-SF: admit waiting prompts shortest output first, as long as the memory lookahead
+    over the completion times of all resident requests stays within M.
+
+    Prompts with the same output size are taken in order of request id (the waiting
+    queue breaks ties by id). The original script took them in the iteration order of
+    its waiting set, so on such ties the admitted batches, and the latencies, can differ
+    from it.
+    """
+
+    def start(self, sim):
+        # Completion-step index of running and admitted requests for the memory lookahead
+        self.envelope = MemoryEnvelope(sim.M)
+        self.input_size = []
+        self.output_size = []
+
+    def on_arrival(self, sim, slot):
+        # Sizes of the waiting prompts are read one at a time, faster from lists
+        if slot == len(self.input_size):
+            self.input_size.append(0)
+            self.output_size.append(0)
+        self.input_size[slot] = sim.requests.input_size[slot].item()
+        self.output_size[slot] = sim.requests.output_size[slot].item()
+
+    def order_keys(self, requests):
+        return requests.output_size
+
+    def admit(self, sim, batch_size):
+        # The envelope already holds every running request (their tokens are in this
+        # batch), so only the new prompts have to be added. Admit the longest prefix of
+        # the waiting queue that passes the check.
+        input_size = self.input_size
+        output_size = self.output_size
+        envelope = self.envelope
+        profiler = sim.profiler
+
+        def admit_prefix(ordered):
+            with profiler.phase('lookahead'):
+                return envelope.admit_prefix((input_size[x], output_size[x]) for x in ordered)
+
+        with profiler.phase('waiting_queue'):
+            return sim.waiting_prompts.pop_prefix(admit_prefix)
+
+    def on_batch_complete(self, sim):
+        # Every resident request has advanced by one token
+        with sim.profiler.phase('lookahead'):
+            self.envelope.advance()
+
+    def fast_forward(self, sim, steps):
+        with sim.profiler.phase('lookahead'):
+            if not sim.waiting_prompts:
+                self.envelope.advance(steps)
+                return steps
+            # Stop at the first batch formation where the head of the queue would be admitted
+            head = sim.waiting_prompts.peek()
+            input_size, output_size = self.input_size[head], self.output_size[head]
+            for step in range(1, steps + 1):
+                self.envelope.advance()
+                if step < steps and self.envelope.peak_with(input_size, output_size) <= sim.M:
+                    break
+            return step
+
+    def on_overflow(self, sim):
+        print(f"Memory limit exceeded at time {sim.current_time}, usage: {sim.memory_in_use()}")
+        return False  # Stop the simulation if memory limit is exceeded
+
+
+class MCBenchmark(MCSF):
+    """MC-Benchmark: the MC-SF memory lookahead with waiting prompts served FCFS."""
+
+    def order_keys(self, requests):
+        return requests.arrival_time
+
+    def on_overflow(self, sim):
+        return True
+
+
+class AlphaGreedy(Policy):
+    """
+    alpha-greedy: add waiting prompts FCFS, up to B jobs per batch, unless more than
+    M * (1 - alpha) memory is already in use. On overflow every running request is reset.
+    B None puts no cap on the batch size.
+
+    With `eviction` (a victim policy of eviction.py, or an Evictor), an overflow only
+    resets the running requests it selects, just enough of them to get back within M.
+    """
+
+    def __init__(self, alpha, B, eviction=None):
+        self.alpha = alpha  # Parameter for memory check (0 < alpha < 1)
+        self.max_batch_size = B
+        self.evictor = Evictor(eviction) if isinstance(eviction, str) else eviction
+
+    def order_keys(self, requests):
+        return requests.arrival_time
+
+    def admit(self, sim, batch_size):
+        if sim.memory_in_use() > sim.M * (1 - self.alpha):
+            return []  # Do not add new prompts
+        prompts = []
+        max_batch_size = math.inf if self.max_batch_size is None else self.max_batch_size
+        with sim.profiler.phase('waiting_queue'):
+            while sim.waiting_prompts and batch_size + len(prompts) < max_batch_size:
+                prompts.append(sim.waiting_prompts.pop())
+        return prompts
+
+    def fast_forward(self, sim, steps):
+        # Without arrivals and completions the waiting queue and the batch size stay the
+        # same and memory only grows, so no prompt is admitted until the run ends
+        return steps
+
+    def on_overflow(self, sim):
+        if self.evictor is not None:
+            return self.evict(sim)
+        # Perform memory reset
+        sim.memory_resets += 1
+        sim.reset_requests(list(sim.running_requests))
+        sim.record(0)
+        print(f"Memory reset occurred at time {sim.current_time}")
+        return True
+
+    def evict(self, sim):
+        sim.memory_resets += 1
+        victims = self.evictor.select(sim)
+        sim.reset_requests(victims)
+        sim.record(sim.memory_in_use())
+        print(f"Evicted {len(victims)} requests at time {sim.current_time}")
+        return True
+
+
+class AlphaBeta(AlphaGreedy):
+    """
+    alpha-protection, beta-clearing: alpha-greedy admission, but on overflow each running
+    request is reset with probability beta. If memory is still over M, the machine idles
+    for one time unit and the partial reset is repeated. With `eviction`, overflows are
+    handled as in AlphaGreedy instead.
+    """
+
+    def __init__(self, alpha, beta, B, rng=random, eviction=None):
+        super().__init__(alpha, B, eviction)
+        self.beta = beta
+        self.rng = rng
+
+    def on_overflow(self, sim):
+        if self.evictor is not None:
+            return self.evict(sim)
+        total_memory_usage = sim.memory_in_use()
+        while total_memory_usage > sim.M and sim.current_time < sim.time_limit:
+            # Perform partial memory reset based on beta
+            sim.memory_resets += 1
+            requests_reset = [req_id for req_id in list(sim.running_requests)
+                              if self.rng.random() < self.beta]
+            sim.reset_requests(requests_reset)
+            total_memory_usage = sim.memory_in_use()
+            sim.record(total_memory_usage)
+            print(f"Partial memory reset occurred at time {sim.current_time}, reset {len(requests_reset)} requests")
+            if total_memory_usage <= sim.M:
+                break  # Memory usage is acceptable
+            # Advance time by 1 unit during which no processing occurs
+            sim.idle_until(sim.current_time + 1)
+        return True
@@ -0,0 +1,129 @@
+import json
+import time
+
+
+class PhaseProfiler:
+    """
+    Wall time and call counts of the phases of a simulation, for finding out which part
+    of the event loop a slow replay spends its time in.
+
+    Pass one to the Simulator (`profiler=PhaseProfiler()`); without one it uses a
+    NullProfiler, whose phases do nothing. The loop times a phase with
+    `with profiler.phase(name):`. Phases nest, and each one is accounted under the stack
+    of phases it ran in:
+      - run: Simulator.run (its own time is the rest of the event loop);
+      - complete_batch: processing the end of a batch;
+      - collect_tokens: picking the ready tokens of the next batch;
+      - admit: the admission decision of the policy;
+      - waiting_queue: ordering the waiting requests (pushes and pops of the queue);
+      - lookahead: the MC-SF memory lookahead;
+      - processing_time: the batch processing-time model;
+      - fast_forward: completing runs of identical decode batches at once;
+      - telemetry: recording samples.
+    The results are available per phase and per stack (`as_dict`, `write_json`), and as
+    folded stacks (`folded`, `write_folded`), the input format of flame graph tools
+    such as flamegraph.pl or speedscope.
+    """
+
+    def __init__(self):
+        self.stacks = {}  # Stack of phases -> [calls, total ns, ns spent in nested phases]
+        self._active = []  # [stack, start ns, nested ns] of the phases being timed
+        self._phases = {}  # Phase -> its context manager
+
+    def phase(self, phase):
+        """Context manager timing `phase` (the same object for every call)."""
+        context = self._phases.get(phase)
+        if context is None:
+            context = self._phases[phase] = _Phase(self, phase)
+        return context
+
+    def start(self, phase):
+        active = self._active
+        stack = active[-1][0] + (phase,) if active else (phase,)
+        active.append([stack, time.perf_counter_ns(), 0])
+
+    def stop(self):
+        end = time.perf_counter_ns()
+        stack, begin, nested = self._active.pop()
+        elapsed = end - begin
+        stats = self.stacks.get(stack)
+        if stats is None:
+            stats = self.stacks[stack] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += nested
+        if self._active:
+            self._active[-1][2] += elapsed
+
+    def phases(self):
+        """Calls, total and self time (in seconds) of every phase, over all its stacks."""
+        phases = {}
+        for stack, (calls, total, nested) in self.stacks.items():
+            stats = phases.setdefault(stack[-1], {'calls': 0, 'total_seconds': 0.0, 'self_seconds': 0.0})
+            stats['calls'] += calls
+            stats['self_seconds'] += (total - nested) / 1e9
+            # Time of a phase nested in itself is already in the outer one
+            if stack[-1] not in stack[:-1]:
+                stats['total_seconds'] += total / 1e9
+        return phases
+
+    def as_dict(self):
+        return {
+            'phases': self.phases(),
+            'stacks': [{'stack': ';'.join(stack), 'calls': calls,
+                        'total_seconds': total / 1e9, 'self_seconds': (total - nested) / 1e9}
+                       for stack, (calls, total, nested) in self.stacks.items()],
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def folded(self):
+        """One 'phase;nested phase;... self time in microseconds' line per stack."""
+        return ''.join(f"{';'.join(stack)} {(total - nested) // 1000}\n"
+                       for stack, (_, total, nested) in self.stacks.items())
+
+    def write_folded(self, path):
+        with open(path, 'w') as f:
+            f.write(self.folded())
+
+
+class _Phase:
+    __slots__ = ('profiler', 'phase')
+
+    def __init__(self, profiler, phase):
+        self.profiler = profiler
+        self.phase = phase
+
+    def __enter__(self):
+        self.profiler.start(self.phase)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.stop()
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullProfiler:
+    """The profiler of an unprofiled simulation: its phases are not timed."""
+
+    def phase(self, phase):
+        return _NULL_PHASE
+
+    def start(self, phase):
+        pass
+
+    def stop(self):
+        pass
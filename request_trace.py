@@ -0,0 +1,133 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+COLUMNS = ('arrival_time', 'input', 'output')
+DTYPES = {'arrival_time': np.float64, 'input': np.int32, 'output': np.int32}
+
+
+class Trace:
+    """
+    Request trace as three contiguous arrays: 'arrival_time', 'input' and 'output'.
+
+    Columns are read like DataFrame columns (`trace['input']`), and `head(n)` returns a
+    trace of the first n requests whose columns are views of this one, so prefix sweeps
+    copy nothing. Columns loaded from the cache are read-only memory maps.
+    """
+
+    def __init__(self, arrival_time, input, output):
+        self.columns = {
+            'arrival_time': np.ascontiguousarray(arrival_time, dtype=DTYPES['arrival_time']),
+            'input': _token_counts(input, 'input'),
+            'output': _token_counts(output, 'output'),
+        }
+        if len({len(column) for column in self.columns.values()}) > 1:
+            raise ValueError("Trace columns must have the same length")
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(*(df[name].to_numpy() for name in COLUMNS))
+
+    def __len__(self):
+        return len(self.columns['arrival_time'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def head(self, n):
+        return Trace(*(self.columns[name][:n] for name in COLUMNS))
+
+
+def load_trace(source, cache=True, cache_dir=None):
+    """
+    Loads a request trace from a DataFrame, a CSV or Parquet file, or a directory of
+    per-column .npy files (arrival_time.npy, input.npy and output.npy).
+
+    CSV and Parquet files are parsed once: with `cache`, the columns are written to
+    `cache_dir` and later loads memory-map them, which takes milliseconds whatever the
+    size of the trace. The cache is rebuilt when the file is newer than it. By default
+    it is `<file>.cache/` next to the file, or a directory in the temporary directory
+    if that one cannot be written (e.g. the trace is on a read-only mount).
+
+    The input and output columns may be stored as floats (e.g. 12.0) but must hold
+    whole token counts.
+    """
+    if isinstance(source, Trace):
+        return source
+    if not isinstance(source, (str, os.PathLike)):
+        return Trace.from_frame(source)
+
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        return _load_npy(source)
+    if cache_dir is not None:
+        cache_dirs = [os.fspath(cache_dir)]
+    else:
+        cache_dirs = [source + '.cache', _fallback_cache_dir(source)]
+    if cache:
+        for directory in cache_dirs:
+            if _cache_is_fresh(source, directory):
+                return _load_npy(directory)
+
+    extension = os.path.splitext(source)[1].lower()
+    if extension == '.csv':
+        import pandas as pd
+        # Token counts are read with their inferred type and checked when cast to int32
+        trace = Trace.from_frame(pd.read_csv(source, usecols=list(COLUMNS),
+                                             dtype={'arrival_time': DTYPES['arrival_time']}))
+    elif extension in ('.parquet', '.pq'):
+        import pandas as pd
+        trace = Trace.from_frame(pd.read_parquet(source, columns=list(COLUMNS)))
+    else:
+        raise ValueError(f"Unsupported trace format: {source}")
+
+    if cache:
+        for i, directory in enumerate(cache_dirs):
+            try:
+                save_trace(trace, directory)
+                break
+            except OSError:
+                if i == len(cache_dirs) - 1:
+                    raise
+    return trace
+
+
+def save_trace(trace, directory):
+    """Writes the columns of a trace as .npy files, the format `load_trace` memory-maps."""
+    os.makedirs(directory, exist_ok=True)
+    for name in COLUMNS:
+        np.save(os.path.join(directory, name + '.npy'), trace[name])
+
+
+def _token_counts(values, name):
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.integer) and len(values):
+        if not np.all(np.isfinite(values)) or np.any(values != np.round(values)):
+            raise ValueError(f"Trace column '{name}' must hold whole token counts")
+    if len(values) and values.dtype != DTYPES[name] and (
+            values.min() < 0 or values.max() > np.iinfo(DTYPES[name]).max):
+        raise ValueError(f"Trace column '{name}' is out of the range of {np.dtype(DTYPES[name])}")
+    return np.ascontiguousarray(values, dtype=DTYPES[name])
+
+
+def _fallback_cache_dir(source):
+    # One directory per trace path, for traces whose own directory is not writable
+    key = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), 'trace-cache',
+                        f"{os.path.basename(source)}-{key}.cache")
+
+
+def _load_npy(directory):
+    # Columns already in the trace dtypes stay memory-mapped
+    return Trace(*(np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+                   for name in COLUMNS))
+
+
+def _cache_is_fresh(source, cache_dir):
+    paths = [os.path.join(cache_dir, name + '.npy') for name in COLUMNS]
+    if not all(os.path.exists(path) for path in paths):
+        return False
+    source_mtime = os.path.getmtime(source)
+    return all(os.path.getmtime(path) >= source_mtime for path in paths)
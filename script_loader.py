@@ -0,0 +1,18 @@
+import importlib.util
+import os
+import sys
+
+
+def load_script(filename):
+    """
+    Imports one of the scripts of this directory as a module, also when its file name
+    is not a valid module name (MC-SF_synthetic.py is imported as MC_SF_synthetic).
+    """
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    if name not in sys.modules:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
@@ -0,0 +1,632 @@
+import copy
+import itertools
+import math
+
+import numpy as np
+
+from profiling import NullProfiler
+from telemetry import Telemetry
+from waiting_queue import WaitingQueue
+
+
+class RequestStore:
+    """
+    Columnar state of the requests in the system: one NumPy array per field, indexed by
+    slot. A request takes a free slot when it arrives and gives it back when it
+    completes, so the store grows with the number of requests waiting or running at
+    once, not with the length of the trace.
+
+    A batch completion updates all of its requests with a few masked array operations
+    instead of one attribute access per request, and a slot costs SLOT_BYTES (45) bytes.
+    """
+
+    FIELDS = (
+        ('request_id', np.int64),  # Row of the request in the trace
+        ('arrival_time', np.float64),
+        ('input_size', np.int32),
+        ('output_size', np.int32),
+        ('tokens_processed', np.int32),  # Number of output tokens processed
+        ('remaining_tokens', np.int32),  # Output tokens left, plus the prompt until it is processed
+        ('context_length', np.int32),  # Context length for the next token
+        ('started', bool),  # Whether the prompt has been processed
+        ('start_time', np.float64),  # Time when the prompt was first processed
+    )
+    SLOT_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in FIELDS)
+
+    def __init__(self, capacity=1024):
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.num_slots = 0  # Slots ever used
+        self.free_slots = []
+
+    def __len__(self):
+        """Number of requests in the system."""
+        return self.num_slots - len(self.free_slots)
+
+    def add(self, request_id, arrival_time, input_size, output_size):
+        """Stores an arriving request and returns its slot."""
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = self.num_slots
+            self.num_slots += 1
+            if slot == len(self.request_id):
+                for name, _ in self.FIELDS:
+                    column = getattr(self, name)
+                    setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+        self.request_id[slot] = request_id
+        self.arrival_time[slot] = arrival_time
+        self.input_size[slot] = input_size
+        self.output_size[slot] = output_size
+        self.tokens_processed[slot] = 0
+        self.remaining_tokens[slot] = output_size + 1  # Include prompt processing
+        self.context_length[slot] = 0
+        self.started[slot] = False
+        self.start_time[slot] = np.nan
+        return slot
+
+    def release(self, slots):
+        """Frees the slots of completed requests."""
+        self.free_slots.extend(slots)
+
+    def memory_usage(self, ids):
+        """Memory held by the given (started) requests."""
+        return int(self.input_size[ids].sum() + self.tokens_processed[ids].sum())
+
+
+class ArrivalCursor:
+    """
+    The arrivals of a trace in order of time (ties in order of request id), read
+    through a cursor one block of BLOCK_SIZE requests at a time.
+
+    Only the current block is converted to Python values, so a trace that is larger
+    than memory (e.g. memory-mapped .npy columns from request_trace.load_trace) is read
+    from disk as the simulation goes. A trace that is already sorted by arrival time,
+    the usual case, needs no index; otherwise a sorting permutation is built once.
+    `source` is an optional iterator over further traces, read one by one once the
+    arrivals of the previous ones are used up (see run_stream); their request ids
+    continue those of the previous traces.
+    """
+
+    BLOCK_SIZE = 4096
+
+    def __init__(self, trace, source=None):
+        self.source = source
+        self.first_id = 0  # Request id of the first row of the current trace
+        self._open(trace)
+
+    def _open(self, trace):
+        self.arrival_time = np.asarray(trace['arrival_time'])
+        self.input_size = np.asarray(trace['input'])
+        self.output_size = np.asarray(trace['output'])
+        self.order = None if _is_sorted(self.arrival_time) else _arrival_order(self.arrival_time)
+        self.position = 0  # Arrivals of the current trace read into blocks
+        self._load_block()
+
+    def __len__(self):
+        """Number of requests of the traces read so far."""
+        return self.first_id + len(self.arrival_time)
+
+    def __deepcopy__(self, memo):
+        # The columns, the order and the blocks are never modified in place: a copy only
+        # needs its own position (a streamed source is still shared)
+        return copy.copy(self)
+
+    def _load_block(self):
+        if self.position == len(self.arrival_time):
+            trace = next(self.source, None) if self.source is not None else None
+            if trace is None:
+                self.source = None
+                self._times = []
+                self.next_time = math.inf  # No more arrivals
+            else:
+                self.first_id += len(self.arrival_time)
+                self._open(trace)
+            return
+        start = self.position
+        self.position = end = min(start + self.BLOCK_SIZE, len(self.arrival_time))
+        if self.order is None:
+            rows = slice(start, end)
+            self._ids = list(range(self.first_id + start, self.first_id + end))
+        else:
+            rows = self.order[start:end]
+            self._ids = (rows + self.first_id).tolist()
+        self._times = self.arrival_time[rows].tolist()
+        self._inputs = self.input_size[rows].tolist()
+        self._outputs = self.output_size[rows].tolist()
+        self._index = 0
+        self.next_time = self._times[0]  # Time of the next arrival
+
+    def pop(self):
+        """Returns the next arrival as (request id, arrival time, input size, output size)."""
+        i = self._index
+        arrival = (self._ids[i], self._times[i], self._inputs[i], self._outputs[i])
+        i += 1
+        if i == len(self._times):
+            self._load_block()
+        else:
+            self._index = i
+            self.next_time = self._times[i]
+        return arrival
+
+    def extend(self, trace):
+        """
+        Continues with the rows of `trace` beyond the current ones (the current trace
+        must be a prefix of it, and the new requests must not have arrived yet).
+        """
+        assert self.first_id == 0 and self.source is None
+        num_read = self.position - (len(self._times) - self._index) if self._times else self.position
+        num_rows = len(self.arrival_time)
+        arrival_time = np.asarray(trace['arrival_time'])
+        if self.order is None and _is_sorted(arrival_time[max(num_rows - 1, 0):]):
+            self.position = num_read
+        else:
+            rows = self.order[num_read:] if self.order is not None else np.arange(num_read, num_rows)
+            rows = np.concatenate((rows, np.arange(num_rows, len(arrival_time))))
+            self.order = rows[np.lexsort((rows, arrival_time[rows]))]
+            self.position = 0
+        self.arrival_time = arrival_time
+        self.input_size = np.asarray(trace['input'])
+        self.output_size = np.asarray(trace['output'])
+        self._load_block()
+
+
+def _is_sorted(times, block_size=1 << 20):
+    """Whether `times` is non-decreasing, checked by blocks to bound the temporaries."""
+    for start in range(0, len(times) - 1, block_size):
+        block = times[start:start + block_size + 1]
+        if (block[1:] < block[:-1]).any():
+            return False
+    return True
+
+
+def _arrival_order(times):
+    """Rows in order of arrival time, ties in order of row."""
+    return np.argsort(times, kind='stable')
+
+
+# Longest run of decode batches completed at once by the fast-forward; longer runs are
+# completed in several jumps
+FAST_FORWARD_MAX_STEPS = 4096
+
+
+def batch_processing_time(batch_size, total_context_length, total_input_of_prompts):
+    """Processing time of a batch in seconds, from the fitted latency model (in milliseconds)."""
+    average_context_length = total_context_length / batch_size
+    return (
+        (0.0027 * average_context_length + 0.52) * batch_size +
+        44.6 + 0.378 * total_input_of_prompts
+    ) / 1000  # Convert milliseconds to seconds
+
+
+class Policy:
+    """
+    Batch-formation policy plugged into the Simulator.
+
+    The simulator owns the event loop, the request state and the processing-time model;
+    a policy only decides:
+      - ordering: `order_keys(requests)`, the waiting-queue key of the requests of the
+        RequestStore, as an array indexed by slot (ties are broken by request id);
+      - admission: `admit(sim, batch_size)`, which prompts join the batch being formed
+        after the ready tokens (`batch_size` of them) have been collected;
+      - overflow handling: `on_overflow(sim)`, called after an event leaves more than M
+        memory in use. Returning False stops the simulation.
+    `max_batch_size` caps the number of jobs per batch (None for no cap), and `start`,
+    `on_arrival` (a request took `slot` in the RequestStore) and `on_batch_complete` let a
+    policy keep its own per-run state in sync. `fast_forward(sim, steps)` lets the
+    simulator complete up to `steps` identical decode-only batches at once (see
+    Simulator._fast_forward): it returns how many, s, such that the policy would admit
+    nothing at the s - 1 batch formations in between, after updating its state as for
+    s batch completions. The default, 0, keeps the simulation batch by batch.
+    Simulations are forked with deepcopy, so that state (including any random generator)
+    must be copyable.
+    """
+
+    max_batch_size = None
+
+    def start(self, sim):
+        pass
+
+    def on_arrival(self, sim, slot):
+        pass
+
+    def order_keys(self, requests):
+        raise NotImplementedError
+
+    def admit(self, sim, batch_size):
+        return []
+
+    def on_batch_complete(self, sim):
+        pass
+
+    def fast_forward(self, sim, steps):
+        return 0
+
+    def on_overflow(self, sim):
+        return True
+
+
+class Simulator:
+    """
+    Discrete-event simulation of a single machine serving LLM requests in batches.
+
+    Every batch holds the next token of running requests and the prompts of newly
+    admitted requests; its processing time follows `batch_processing_time`. Arrivals
+    are read from `trace` (a request_trace.Trace or a DataFrame with columns
+    'arrival_time', 'input' and 'output', or an ArrivalCursor) as the simulation
+    reaches them, and the policy decides what goes into each batch. The simulation ends
+    once every event has been processed or when `time_limit` is reached.
+
+    Requests, from the policies' point of view, are slots of the RequestStore `requests`,
+    which only holds the requests in the system; a completed request only adds to
+    `num_completed` and to the latency sum of `average_latency`.
+
+    Memory in use and running tasks are sampled into `telemetry`, a Telemetry recorder
+    (by default one that keeps every sample in memory). With `fast_forward`, runs of
+    identical decode-only batches are completed at once when the policy allows it; the
+    results are the same. A profiling.PhaseProfiler given as `profiler` times the
+    phases of the loop.
+    """
+
+    def __init__(self, trace, policy, M, time_limit=math.inf, telemetry=None, fast_forward=True,
+                 profiler=None):
+        self.policy = policy
+        self.M = M
+        self.time_limit = time_limit
+        self.fast_forward = fast_forward
+        self.profiler = NullProfiler() if profiler is None else profiler
+        self.current_time = 0.0
+        self.until = math.inf  # Pause time of the current run
+
+        # Arrivals, in order of time, and the requests in the system
+        self.arrivals = trace if isinstance(trace, ArrivalCursor) else ArrivalCursor(trace)
+        self.requests = RequestStore()
+
+        # System state
+        self.order_keys = []  # (policy key, request id) of every slot
+        self.waiting_prompts = WaitingQueue(key=self._order_key)
+        # Request sets are dicts (keys only): their iteration order, which decides the tokens
+        # picked under a batch size limit and the order of random resets, is the insertion
+        # order, and it survives copying
+        self.running_requests = {}  # Requests that have been started but not yet completed
+        self.tokens_ready = {}  # Requests whose next token is ready to be processed
+        self.resident_memory = 0  # Memory held by the running requests
+
+        # Telemetry
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        self.memory_resets = 0  # Number of overflow resets performed by the policy
+        self.requests_reset = 0  # Requests whose progress was discarded by a reset
+        self.wasted_tokens = 0  # Output tokens processed by them, to be processed again
+
+        # Results: the latencies are summed exactly as they complete (see _add_latencies),
+        # so the sum does not depend on the completion order and nothing is kept per request
+        self.num_arrivals = 0
+        self.num_batches = 0  # Batches started, fast-forwarded ones included
+        self.num_completed = 0
+        self._latency_partials = []  # Non-overlapping floats whose exact sum is the latency sum
+
+        # Machine state
+        self.machine_busy = False
+        self.batch_end_time = 0.0
+        self.batch_in_progress = None
+        self.stopped = False  # Set when the policy stops the simulation
+
+        policy.start(self)
+
+    def extend(self, trace):
+        """
+        Adds the requests of `trace` beyond the ones already simulated, i.e. turns this
+        simulation of a prefix of `trace` into one of the whole trace. The new requests
+        must not have arrived yet (see run_prefixes).
+        """
+        self.arrivals.extend(trace)
+        return self
+
+    def _arrive(self):
+        """Moves the next arrival into the RequestStore and the waiting queue."""
+        request_id, arrival_time, input_size, output_size = self.arrivals.pop()
+        self.num_arrivals += 1
+        slot = self.requests.add(request_id, arrival_time, input_size, output_size)
+        key = (self.policy.order_keys(self.requests)[slot].item(), request_id)
+        if slot == len(self.order_keys):
+            self.order_keys.append(key)
+        else:
+            self.order_keys[slot] = key
+        self.policy.on_arrival(self, slot)
+        with self.profiler.phase('waiting_queue'):
+            self.waiting_prompts.push(slot)
+
+    def _order_key(self, slot):
+        return self.order_keys[slot]
+
+    # -------------------------------
+    # Main simulation loop
+    # -------------------------------
+    def run(self, until=math.inf):
+        """
+        Runs the simulation to its end, or pauses it before the first event at or after
+        `until`; a paused simulation resumes with another call. Requests arriving at or
+        after `until` may be added to the arrivals in the meantime: nothing is simulated
+        beyond it, not even by the fast-forward.
+        """
+        self.until = until
+        policy = self.policy
+        with self.profiler.phase('run'):
+            while not self.stopped:
+                # Check if simulation should end
+                if self.current_time >= self.time_limit:
+                    break
+
+                # Determine the next event; a batch completion goes before an arrival at the same time
+                next_arrival = self.arrivals.next_time
+                next_event_time = self.batch_end_time if self.machine_busy else math.inf
+                if next_arrival < next_event_time:
+                    next_event_time = next_arrival
+                if next_event_time == math.inf:
+                    break  # No more events to process
+                if next_event_time >= until:
+                    break
+
+                # Advance time to the next event, but not beyond the time limit
+                self.current_time = min(next_event_time, self.time_limit)
+
+                if self.machine_busy and self.current_time == self.batch_end_time:
+                    self._complete_batch()
+                elif self.current_time == next_arrival:
+                    self._arrive()
+                else:
+                    continue  # Stopped at the time limit
+
+                memory_in_use = self.memory_in_use()
+                self.record(memory_in_use)
+                if memory_in_use > self.M and not policy.on_overflow(self):
+                    self.stopped = True
+                    break
+
+                # Check if machine is idle and can start a new batch
+                if not self.machine_busy and self.current_time < self.time_limit:
+                    self._form_batch()
+        return self
+
+    def _complete_batch(self):
+        with self.profiler.phase('complete_batch'):
+            requests = self.requests
+            ids = self.batch_in_progress['requests']
+            requests.tokens_processed[ids] += 1
+            remaining_tokens = requests.remaining_tokens[ids] - 1
+            requests.remaining_tokens[ids] = remaining_tokens
+            prompt = ~requests.started[ids]
+            ready = prompt | (remaining_tokens > 0)
+            # Prompts: the next token has context length 1; tokens: increment the context length
+            requests.context_length[ids] = np.where(prompt, 1, requests.context_length[ids] + ready)
+
+            # Every request in the batch holds one more token; started requests also bring
+            # their prompt and completed ones release everything
+            memory_delta = len(ids)
+            all_ready = ready.all()
+            if not all_ready:
+                completed = ids[~ready]
+                memory_delta -= requests.memory_usage(completed)
+                latencies = self.current_time - requests.arrival_time[completed]
+                self._add_latencies(latencies.tolist())
+                completed = completed.tolist()
+                for req_id in completed:
+                    del self.running_requests[req_id]
+                requests.release(completed)
+            if prompt.any():
+                started = ids[prompt]
+                requests.started[started] = True
+                requests.start_time[started] = self.current_time
+                memory_delta += int(requests.input_size[started].sum())
+                self.running_requests.update(dict.fromkeys(started.tolist()))
+            self.resident_memory += memory_delta
+            self.tokens_ready.update(dict.fromkeys((ids if all_ready else ids[ready]).tolist()))
+            self.policy.on_batch_complete(self)
+            self.machine_busy = False
+            self.batch_in_progress = None
+
+    def _form_batch(self):
+        requests = self.requests
+        max_batch_size = self.policy.max_batch_size
+        profiler = self.profiler
+
+        while True:
+            # Step 1: Include tokens ready to be processed
+            with profiler.phase('collect_tokens'):
+                if max_batch_size is None or len(self.tokens_ready) <= max_batch_size:
+                    tokens = list(self.tokens_ready)
+                    self.tokens_ready.clear()
+                else:
+                    # Batch size limit reached: the remaining tokens wait for the next batch
+                    tokens = list(itertools.islice(self.tokens_ready, max_batch_size))
+                    for req_id in tokens:
+                        del self.tokens_ready[req_id]
+                tokens = np.array(tokens, dtype=np.int64)
+                total_context_length = int(requests.context_length[tokens].sum())
+
+            # Step 2: Add the prompts chosen by the policy
+            with profiler.phase('admit'):
+                prompts = np.array(self.policy.admit(self, len(tokens)), dtype=np.int64)
+            total_input_of_prompts = int(requests.input_size[prompts].sum())
+
+            # A decode-only batch of every running request: skip ahead over the identical
+            # batches that follow it, then form the batch at the new time
+            if (self.fast_forward and len(tokens) and not len(prompts) and not self.tokens_ready
+                    and self._fast_forward(tokens, total_context_length)):
+                continue
+            break
+
+        batch_size = len(tokens) + len(prompts)
+        if batch_size:
+            with profiler.phase('processing_time'):
+                processing_time = batch_processing_time(
+                    batch_size, total_context_length, total_input_of_prompts)
+            # Ensure batch_end_time does not exceed time_limit
+            self.batch_end_time = min(self.current_time + processing_time, self.time_limit)
+            self.machine_busy = True
+            self.num_batches += 1
+            self.batch_in_progress = {
+                'start_time': self.current_time,
+                'end_time': self.batch_end_time,
+                'requests': np.concatenate((tokens, prompts)),
+                'size': batch_size
+            }
+
+    def _fast_forward(self, tokens, total_context_length):
+        """
+        Completes a run of decode-only batches of `tokens` at once and returns its length
+        (0 if it is too short to be worth it).
+
+        Until a request completes, an arrival comes or the policy admits a prompt, every
+        batch holds the same requests and only the context grows, by one token per
+        request and batch, so the batch end times follow from the processing-time model
+        (accumulated in the same order as one batch at a time). The run also stops before
+        memory would exceed M, the time limit or the pause time is reached; the policy
+        has the last word through `Policy.fast_forward`.
+        """
+        profiler = self.profiler
+        with profiler.phase('fast_forward'):
+            requests = self.requests
+            n = len(tokens)
+            steps = min(int(requests.remaining_tokens[tokens].min()) - 1,  # No completion
+                        (self.M - self.resident_memory) // n,  # No overflow
+                        FAST_FORWARD_MAX_STEPS)
+            if steps < 2:
+                return 0
+            contexts = total_context_length + n * np.arange(steps)
+            with profiler.phase('processing_time'):
+                processing_times = batch_processing_time(n, contexts, 0)
+            # times[j] is the end of the j-th batch (times[0] is now)
+            times = np.cumsum(np.concatenate(([self.current_time], processing_times)))
+            steps = min(steps,
+                        int(np.searchsorted(times[1:], min(self.arrivals.next_time, self.until),
+                                            side='right')),
+                        int(np.searchsorted(times[1:], self.time_limit, side='left')))
+            if steps < 2:
+                return 0
+            steps = self.policy.fast_forward(self, steps)
+            if not steps:
+                return 0
+
+            requests.tokens_processed[tokens] += steps
+            requests.remaining_tokens[tokens] -= steps
+            requests.context_length[tokens] += steps
+            memory = self.resident_memory + n * np.arange(1, steps + 1)
+            with profiler.phase('telemetry'):
+                self.telemetry.record_many(times[1:steps + 1], memory, len(self.running_requests))
+            self.resident_memory = int(memory[-1])
+            self.current_time = float(times[steps])
+            self.num_batches += steps
+            self.tokens_ready.update(dict.fromkeys(tokens.tolist()))
+            return steps
+
+    # -------------------------------
+    # Helpers for policies
+    # -------------------------------
+    def memory_in_use(self):
+        return self.resident_memory
+
+    def record(self, memory_in_use):
+        with self.profiler.phase('telemetry'):
+            self.telemetry.record(self.current_time, memory_in_use, len(self.running_requests))
+
+    def reset_requests(self, ids):
+        """Discards the progress of running requests and moves them back to the waiting queue."""
+        ids = np.asarray(ids, dtype=np.int64)
+        requests = self.requests
+        self.resident_memory -= requests.memory_usage(ids)
+        self.requests_reset += len(ids)
+        self.wasted_tokens += int(requests.tokens_processed[ids].sum())
+        requests.tokens_processed[ids] = 0
+        requests.started[ids] = False
+        requests.remaining_tokens[ids] = requests.output_size[ids] + 1
+        requests.start_time[ids] = np.nan
+        requests.context_length[ids] = 0
+        for req_id in ids.tolist():
+            del self.running_requests[req_id]
+            self.tokens_ready.pop(req_id, None)
+            self.waiting_prompts.push(req_id)
+
+    def idle_until(self, t):
+        """Lets the machine sit idle until time t, taking in the arrivals on the way."""
+        memory_in_use = self.memory_in_use()
+        arrivals = self.arrivals
+        while arrivals.next_time <= t and arrivals.next_time <= self.time_limit:
+            self.current_time = arrivals.next_time
+            self._arrive()
+            self.record(memory_in_use)
+        self.current_time = min(t, self.time_limit)
+
+    # -------------------------------
+    # Results
+    # -------------------------------
+    def _add_latencies(self, latencies):
+        # Shewchuk's exact summation, the algorithm of math.fsum, kept up to date as
+        # requests complete: the partials hold the sum without rounding error, in a few
+        # floats whatever the number of requests
+        partials = self._latency_partials
+        for x in latencies:
+            i = 0
+            for y in partials:
+                if abs(x) < abs(y):
+                    x, y = y, x
+                hi = x + y
+                lo = y - (hi - x)
+                if lo:
+                    partials[i] = lo
+                    i += 1
+                x = hi
+            partials[i:] = [x]
+        self.num_completed += len(latencies)
+
+    def average_latency(self):
+        """Average latency of the completed requests (their sum is correctly rounded)."""
+        return math.fsum(self._latency_partials) / self.num_completed
+
+    @property
+    def memory_usage_over_time(self):
+        return list(zip(self.telemetry.time.tolist(), self.telemetry.memory_in_use.tolist()))
+
+    @property
+    def num_of_task_over_time(self):
+        return self.telemetry.num_of_tasks.tolist()
+
+
+def run_prefixes(trace, sizes, policy, M, time_limit=math.inf):
+    """
+    Simulates `policy` on each prefix `trace.head(n)` for n in `sizes` (increasing) and
+    yields (n, finished Simulator) pairs; each result is the same as a separate run.
+
+    Online policies never look at future arrivals, so the run on a longer prefix
+    matches the run on a shorter one until the first of the additional requests
+    arrives. Each run is paused there and forked: the fork gets the additional requests
+    and continues as the run on the next prefix, while the original is finished. Only
+    the part after the first additional arrival is simulated again. If a policy moved
+    the clock past that arrival during an event (alpha-beta idles on overflow), the
+    next prefix is simulated from the start instead.
+    """
+    sim = Simulator(trace.head(sizes[0]), policy, M, time_limit=time_limit)
+    initial = copy.deepcopy(sim)
+    for size, next_size in zip(sizes, sizes[1:]):
+        additional = trace['arrival_time'][size:next_size]
+        fork_time = float(np.min(additional)) if len(additional) else math.inf
+        sim.run(until=fork_time)
+        fork = copy.deepcopy(sim if sim.current_time < fork_time else initial)
+        yield size, sim.run()
+        sim = fork.extend(trace.head(next_size))
+    yield sizes[-1], sim.run()
+
+
+def run_stream(chunks, policy, M, time_limit=math.inf, telemetry=None, profiler=None):
+    """
+    Simulates `policy` on a trace given as an iterable of chunks (traces in order of
+    arrival: every request of a chunk arrives no earlier than those of the previous
+    ones, e.g. from workload.generate_workload) and returns the finished Simulator,
+    the same as a run on the whole trace. The next chunk is read only when every
+    arrival of the previous ones has been processed, so only one chunk is held at a
+    time.
+    """
+    chunks = iter(chunks)
+    arrivals = ArrivalCursor(next(chunks), source=chunks)
+    return Simulator(arrivals, policy, M, time_limit=time_limit, telemetry=telemetry,
+                     profiler=profiler).run()
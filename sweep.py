@@ -0,0 +1,131 @@
+import contextlib
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from policies import MCSF, AlphaBeta, AlphaGreedy, MCBenchmark
+from request_trace import COLUMNS, Trace, load_trace
+from simulator import Simulator
+
+# Policy name -> (constructor, parameters it depends on)
+POLICIES = {
+    'MC-SF': (lambda cell: MCSF(), ()),
+    'MC-Benchmark': (lambda cell: MCBenchmark(), ()),
+    'alpha-greedy': (lambda cell: AlphaGreedy(cell['alpha'], cell['B']), ('alpha', 'B')),
+    'alpha-beta': (lambda cell: AlphaBeta(cell['alpha'], cell['beta'], cell['B'],
+                                          rng=random.Random(cell['seed'])),
+                   ('alpha', 'beta', 'B')),
+}
+
+
+def expand_grid(policy, num_rows, M, alpha=(None,), beta=(None,), B=(None,)):
+    """
+    Cells of the sweep: one dict per combination of the given values. Parameters a
+    policy does not use are set to None, so each distinct configuration appears once.
+    alpha (alpha-greedy and alpha-beta) and beta (alpha-beta) must be given; B None
+    means no cap on the batch size.
+    """
+    cells = []
+    seen = set()
+    for name, rows, m, a, b, batch in itertools.product(policy, num_rows, M, alpha, beta, B):
+        uses = POLICIES[name][1]
+        for parameter, value in (('alpha', a), ('beta', b)):
+            if parameter in uses and value is None:
+                raise ValueError(f"{name} needs a value of {parameter}")
+        cell = {'policy': name, 'num_rows': rows, 'M': m,
+                'alpha': a if 'alpha' in uses else None,
+                'beta': b if 'beta' in uses else None,
+                'B': batch if 'B' in uses else None}
+        key = tuple(cell.values())
+        if key not in seen:
+            seen.add(key)
+            cells.append(cell)
+    return cells
+
+
+def run_sweep(trace, policy, num_rows, M, alpha=(None,), beta=(None,), B=(None,),
+              time_limit=math.inf, seed=0, max_workers=None):
+    """
+    Simulates every cell of the grid over prefixes of `trace` on a process pool and
+    returns the results as a DataFrame, one row per cell in grid order.
+
+    The trace columns are placed once in shared memory and mapped read-only by every
+    worker. Cells are submitted largest prefix first, so the sweep takes about as long
+    as its slowest cell when there are enough workers. The output of the policies is
+    discarded, and alpha-beta draws from its own generator seeded with `seed`.
+
+    The workers are forked, whatever the default start method of the platform, so that
+    they share the resource tracker of this process, which unlinks the blocks.
+    """
+    import pandas as pd
+
+    trace = load_trace(trace)
+    cells = expand_grid(policy, num_rows, M, alpha, beta, B)
+    for index, cell in enumerate(cells):
+        cell.update(index=index, time_limit=time_limit, seed=seed)
+
+    blocks = []
+    try:
+        columns = {}
+        for name in COLUMNS:
+            column = trace[name]
+            block = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(column.shape, dtype=column.dtype, buffer=block.buf)[:] = column
+            columns[name] = (block.name, column.shape, column.dtype.str)
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_trace,
+                                 initargs=(columns,),
+                                 mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(_run_cell, cell)
+                       for cell in sorted(cells, key=lambda cell: -cell['num_rows'])]
+            for future in as_completed(futures):
+                rows.append(future.result())
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    rows.sort(key=lambda row: row['index'])
+    return pd.DataFrame(rows).drop(columns=['index', 'seed'])
+
+
+# Worker state: the shared trace and its memory blocks (kept open for the lifetime of the process)
+_trace = None
+_blocks = []
+
+
+def _attach_trace(columns):
+    global _trace
+    arrays = {}
+    for name, (block_name, shape, dtype) in columns.items():
+        # Workers are forked and share the resource tracker of the parent (see run_sweep):
+        # a tracker of their own would unlink the blocks when the first worker exits
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    _trace = Trace(*(arrays[name] for name in COLUMNS))
+
+
+def _run_cell(cell):
+    policy = POLICIES[cell['policy']][0](cell)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        sim = Simulator(_trace.head(cell['num_rows']), policy, cell['M'],
+                        time_limit=cell['time_limit']).run()
+    completed = sim.num_completed
+    return dict(cell,
+                average_latency=sim.average_latency() if completed else math.nan,
+                completed=completed,
+                memory_resets=sim.memory_resets,
+                wall_time=time.perf_counter() - start)
@@ -0,0 +1,193 @@
+import copy
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+COLUMNS = (('time', np.float64), ('memory_in_use', np.int64), ('num_of_tasks', np.int32))
+
+
+class Telemetry:
+    """
+    Time series of the memory in use and the number of running tasks, one sample per
+    recorded event, kept in typed arrays that grow by chunks of `chunk_size` samples.
+
+    Downsampling is optional:
+      - None keeps every sample;
+      - 'change' keeps a sample only if the memory or the task count changed since the
+        last kept sample, which loses nothing of the curves;
+      - 'interval' keeps the first sample of every `interval` seconds.
+    With a `memory_budget` (in bytes), full chunks beyond the budget are appended to
+    one raw file per column in `spill_dir` (a temporary directory by default). Reading a
+    column of a spilled series first moves the remaining samples to disk and returns a
+    read-only memory map, so the series never has to fit in memory.
+
+    A temporary spill directory is deleted with the recorder, or by `close()`. Copies
+    (deepcopy, pickling) spill to a temporary directory of their own, which starts with
+    a copy of the samples already spilled.
+    """
+
+    def __init__(self, downsample=None, interval=1.0, chunk_size=1 << 16,
+                 memory_budget=None, spill_dir=None):
+        if downsample not in (None, 'change', 'interval'):
+            raise ValueError(f"Unknown downsampling mode: {downsample}")
+        self.downsample = downsample
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.num_spilled = 0  # Samples already written to disk
+        self._chunks = []  # Full chunks still in memory, oldest first
+        self._chunk = self._new_chunk()
+        self._fill = 0  # Samples in the current chunk
+        self._last = None  # (memory_in_use, num_of_tasks) of the last kept sample
+        self._next_time = -np.inf  # Start of the next sampling interval
+        self._finalizer = None  # Deletes spill_dir if it is a temporary directory
+
+    def __deepcopy__(self, memo):
+        copied = Telemetry.__new__(Telemetry)
+        memo[id(self)] = copied
+        copied.__dict__.update(copy.deepcopy(self._state(), memo))
+        copied._finalizer = None
+        if self.num_spilled:
+            copied._temporary_spill_dir()
+            for name, _ in COLUMNS:
+                shutil.copyfile(self._path(name), copied._path(name))
+        return copied
+
+    def __getstate__(self):
+        # The copy may live in another process, after this recorder is gone: it gets the
+        # spilled samples themselves
+        state = self._state()
+        if self.num_spilled:
+            state['_spilled'] = [np.fromfile(self._path(name), dtype=dtype) for name, dtype in COLUMNS]
+        return state
+
+    def __setstate__(self, state):
+        spilled = state.pop('_spilled', None)
+        self.__dict__.update(state)
+        self._finalizer = None
+        if spilled is not None:
+            self._temporary_spill_dir()
+            for (name, _), values in zip(COLUMNS, spilled):
+                values.tofile(self._path(name))
+
+    def __len__(self):
+        return self.num_spilled + len(self._chunks) * self.chunk_size + self._fill
+
+    def record(self, time, memory_in_use, num_of_tasks):
+        if self.downsample == 'change':
+            if self._last == (memory_in_use, num_of_tasks):
+                return
+            self._last = (memory_in_use, num_of_tasks)
+        elif self.downsample == 'interval':
+            if time < self._next_time:
+                return
+            self._next_time = (time // self.interval + 1) * self.interval
+
+        times, memory, tasks = self._chunk
+        times[self._fill] = time
+        memory[self._fill] = memory_in_use
+        tasks[self._fill] = num_of_tasks
+        self._fill += 1
+        if self._fill == self.chunk_size:
+            self._chunk_full()
+
+    def record_many(self, times, memory_in_use, num_of_tasks):
+        """Records a run of samples given as arrays (num_of_tasks may be a scalar)."""
+        times = np.asarray(times)
+        memory_in_use = np.asarray(memory_in_use)
+        num_of_tasks = np.broadcast_to(num_of_tasks, times.shape)
+        if self.downsample == 'interval':
+            for sample in zip(times.tolist(), memory_in_use.tolist(), num_of_tasks.tolist()):
+                self.record(*sample)
+            return
+        if self.downsample == 'change' and len(times):
+            kept = np.empty(len(times), dtype=bool)
+            kept[0] = self._last != (memory_in_use[0].item(), num_of_tasks[0].item())
+            kept[1:] = (memory_in_use[1:] != memory_in_use[:-1]) | (num_of_tasks[1:] != num_of_tasks[:-1])
+            self._last = (memory_in_use[-1].item(), num_of_tasks[-1].item())
+            times, memory_in_use, num_of_tasks = times[kept], memory_in_use[kept], num_of_tasks[kept]
+
+        start = 0
+        while start < len(times):
+            count = min(len(times) - start, self.chunk_size - self._fill)
+            for column, values in zip(self._chunk, (times, memory_in_use, num_of_tasks)):
+                column[self._fill:self._fill + count] = values[start:start + count]
+            self._fill += count
+            start += count
+            if self._fill == self.chunk_size:
+                self._chunk_full()
+
+    def column(self, name):
+        """All samples of one column ('time', 'memory_in_use' or 'num_of_tasks')."""
+        index = [column for column, _ in COLUMNS].index(name)
+        if self.num_spilled:
+            self._spill(len(self._chunks), partial=True)
+            return np.memmap(self._path(name), dtype=COLUMNS[index][1], mode='r')
+        parts = [chunk[index] for chunk in self._chunks] + [self._chunk[index][:self._fill]]
+        return np.concatenate(parts)
+
+    def close(self):
+        """Deletes the temporary spill directory, if any; spilled samples are then lost."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+    @property
+    def time(self):
+        return self.column('time')
+
+    @property
+    def memory_in_use(self):
+        return self.column('memory_in_use')
+
+    @property
+    def num_of_tasks(self):
+        return self.column('num_of_tasks')
+
+    def _chunk_full(self):
+        self._chunks.append(self._chunk)
+        self._chunk = self._new_chunk()
+        self._fill = 0
+        if (self.memory_budget is not None
+                and (len(self._chunks) + 1) * self._chunk_bytes() > self.memory_budget):
+            self._spill(len(self._chunks))
+
+    def _temporary_spill_dir(self):
+        self.spill_dir = tempfile.mkdtemp(prefix='telemetry-')
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+
+    def _state(self):
+        # Attributes of a copy, which never shares the spill directory
+        state = self.__dict__.copy()
+        del state['_finalizer']
+        state['spill_dir'] = None
+        return state
+
+    def _new_chunk(self):
+        return tuple(np.empty(self.chunk_size, dtype=dtype) for _, dtype in COLUMNS)
+
+    def _chunk_bytes(self):
+        return sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS) * self.chunk_size
+
+    def _path(self, name):
+        return os.path.join(self.spill_dir, name + '.' + np.dtype(dict(COLUMNS)[name]).name)
+
+    def _spill(self, num_chunks, partial=False):
+        """Appends the oldest `num_chunks` full chunks (and the current one) to disk."""
+        if self.spill_dir is None:
+            self._temporary_spill_dir()
+        os.makedirs(self.spill_dir, exist_ok=True)
+        chunks = self._chunks[:num_chunks]
+        del self._chunks[:num_chunks]
+        if partial:
+            chunks.append(tuple(column[:self._fill] for column in self._chunk))
+        for index, (name, _) in enumerate(COLUMNS):
+            with open(self._path(name), 'ab') as f:
+                for chunk in chunks:
+                    chunk[index].tofile(f)
+        self.num_spilled += sum(len(chunk[0]) for chunk in chunks)
+        if partial:
+            self._fill = 0
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from benchmark import compare_to_baseline, save_baseline
+
+
+def runs(events_per_second, peak_rss_mb, result):
+    return [{'name': 'MC-SF', 'size': size, 'wall_time': size / events_per_second,
+             'events_per_second': events_per_second, 'batches_per_second': events_per_second / 2,
+             'peak_rss_mb': peak_rss_mb, 'result': result}
+            for size in (1000, 4000)]
+
+
+def test_results_only_baseline_skips_throughput_and_memory(tmp_path):
+    path = tmp_path / 'baseline.json'
+    save_baseline(path, runs(1e6, 50.0, 12.5), results_only=True)
+    with open(path) as f:
+        baseline = json.load(f)
+    assert all(set(run) == {'name', 'size', 'result'} for run in baseline['results'])
+    assert baseline['scaling_exponents'] == {'MC-SF': pytest.approx(1.0)}
+
+    assert compare_to_baseline(runs(1e3, 500.0, 12.5), baseline) == []
+    regressions = compare_to_baseline(runs(1e6, 50.0, 13.0), baseline)
+    assert len(regressions) == 2 and all('result' in message for message in regressions)
+
+
+def test_full_baseline_checks_throughput_and_memory(tmp_path):
+    path = tmp_path / 'baseline.json'
+    save_baseline(path, runs(1e6, 50.0, 12.5))
+    with open(path) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(runs(1e3, 500.0, 12.5), baseline)
+    assert sum('events/s' in message for message in regressions) == 2
+    assert sum('peak RSS' in message for message in regressions) == 2
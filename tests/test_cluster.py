@@ -0,0 +1,89 @@
+import contextlib
+import functools
+import io
+import math
+import random
+
+import numpy as np
+import pytest
+
+import workload
+from cluster import Cluster, ReplicaArrivals, _lookahead_peak
+from memory_envelope import MemoryEnvelope
+from policies import AlphaBeta, AlphaGreedy, MCBenchmark, MCSF
+from request_trace import Trace
+from simulator import ArrivalCursor, Simulator
+
+POLICIES = [MCSF, MCBenchmark, functools.partial(AlphaGreedy, 0.2, 64),
+            functools.partial(AlphaBeta, 0.2, 0.3, 64, rng=random.Random(1))]
+
+
+def trace(n, rate, seed=3):
+    return next(workload.generate_workload(n, workload.Poisson(rate), workload.Uniform(10, 400),
+                                           workload.LogNormal(100, 0.8, 1000), chunk_size=n, seed=seed))
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+def test_one_replica_is_the_simulator(policy):
+    requests = trace(1000, 2.5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulator(requests, policy(), 20000, time_limit=600).run()
+        cluster = Cluster(policy, 1, 20000, router='least-memory', time_limit=600).run(requests)
+    result = cluster.replica_results[0]
+    assert cluster.num_completed == sim.num_completed
+    assert cluster.average_latency() == sim.average_latency()
+    assert result['num_batches'] == sim.num_batches
+    assert np.array_equal(result['telemetry'].memory_in_use, sim.telemetry.memory_in_use)
+
+
+@pytest.mark.parametrize('router', ['round-robin', 'least-memory', 'shortest-queue'])
+def test_processes_do_not_change_the_results(router, monkeypatch):
+    requests = trace(1200, 8.0)
+    results = []
+    for sync_interval, processes, routing_block in [(None, None, 1 << 16), (None, 2, 1 << 16),
+                                                    (None, None, 300), (5.0, 2, 300)]:
+        monkeypatch.setattr(Cluster, 'ROUTING_BLOCK', routing_block)
+        cluster = Cluster(MCSF, 3, 20000, router=router, sync_interval=sync_interval,
+                          processes=processes).run(requests)
+        results.append((sync_interval, cluster.num_completed, cluster.average_latency(),
+                        [result['num_arrivals'] for result in cluster.replica_results]))
+    assert results[0][1:] == results[1][1:]
+    assert results[2][1:] == results[0][1:]
+    assert sum(results[3][3]) == len(requests)
+
+
+def test_average_latency_without_completions():
+    cluster = Cluster(MCSF, 2, 20000).run(Trace([], [], []))
+    assert cluster.num_completed == 0
+    assert math.isnan(cluster.average_latency())
+
+
+def test_replica_arrivals_extend():
+    requests = trace(200, 4.0)
+    arrivals = ReplicaArrivals()
+    arrivals.extend(requests.head(50))
+    cursor = ArrivalCursor(requests.head(50))
+    popped = [arrivals.pop() for _ in range(20)]
+    expected = [cursor.pop() for _ in range(20)]
+    arrivals.extend(requests)
+    cursor.extend(requests)
+    while arrivals.next_time < math.inf:
+        assert arrivals.next_time == cursor.next_time
+        popped.append(arrivals.pop())
+        expected.append(cursor.pop())
+    assert cursor.next_time == math.inf
+    assert len(arrivals) == len(requests)
+    assert popped == expected
+
+
+def test_lookahead_peak_matches_the_envelope():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = rng.integers(0, 40)
+        output_size = rng.integers(1, 300, n).astype(np.int32)
+        input_size = rng.integers(1, 400, n).astype(np.int32)
+        tokens_processed = np.minimum(rng.integers(0, 300, n), output_size).astype(np.int32)
+        envelope = MemoryEnvelope(10 ** 9)
+        for request in zip(input_size.tolist(), output_size.tolist(), tokens_processed.tolist()):
+            envelope.add(*request)
+        assert _lookahead_peak(input_size, output_size, tokens_processed) == envelope.peak()
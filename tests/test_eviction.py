@@ -0,0 +1,41 @@
+import contextlib
+import io
+
+import pytest
+
+import workload
+from eviction import VICTIM_POLICIES, Evictor
+from policies import AlphaBeta, AlphaGreedy
+from simulator import Simulator
+
+
+class CheckedEvictor(Evictor):
+    """Checks every selection: just enough victims to get back within M."""
+
+    def __init__(self, victim_policy):
+        super().__init__(victim_policy)
+        self.num_overflows = 0
+
+    def select(self, sim):
+        victims = super().select(sim)
+        self.num_overflows += 1
+        requests = sim.requests
+        freed = [requests.input_size[slot].item() + requests.tokens_processed[slot].item()
+                 for slot in victims]
+        assert len(set(victims)) == len(victims) and set(victims) <= set(sim.running_requests)
+        assert sim.memory_in_use() - sum(freed) <= sim.M
+        assert sim.memory_in_use() - sum(freed[:-1]) > sim.M
+        return victims
+
+
+@pytest.mark.parametrize('victim_policy', list(VICTIM_POLICIES))
+@pytest.mark.parametrize('policy', [lambda evictor: AlphaGreedy(0.05, 128, eviction=evictor),
+                                    lambda evictor: AlphaBeta(0.05, 0.5, 128, eviction=evictor)])
+def test_eviction_brings_memory_within_M(victim_policy, policy):
+    trace = next(workload.generate_workload(1500, workload.Poisson(8.0), workload.Uniform(10, 400),
+                                            workload.LogNormal(150, 0.8, 1000), chunk_size=1500, seed=5))
+    evictor = CheckedEvictor(victim_policy)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulator(trace, policy(evictor), 20000, time_limit=400).run()
+    assert evictor.num_overflows > 0
+    assert sim.requests_reset >= evictor.num_overflows
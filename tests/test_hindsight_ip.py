@@ -0,0 +1,101 @@
+import random
+
+import numpy as np
+import pytest
+
+from Hindsight_IP import (solve_MILP_capacity_curve, solve_MILP_coarse, solve_MILP_online,
+                          solve_MILP_rolling)
+
+
+def instance(seed):
+    rng = random.Random(seed)
+    arrivals = [{'arrival_time': rng.randint(0, 15), 'length': rng.randint(1, 6)}
+                for _ in range(rng.randint(3, 12))]
+    return rng.randint(10, 30), arrivals, rng.randint(1, 3)
+
+
+def is_feasible(M, arrivals, s, start_times):
+    memory = np.zeros(max(start_times[i] + job['length'] for i, job in enumerate(arrivals)) + 2)
+    for i, job in enumerate(arrivals):
+        if start_times[i] < job['arrival_time']:
+            return False
+        for d in range(1, job['length'] + 1):
+            memory[start_times[i] + d] += s + d
+    return memory.max() <= M
+
+
+@pytest.mark.parametrize('solve', [
+    lambda M, arrivals, s: solve_MILP_online(M, arrivals, s, backend='highs'),
+    lambda M, arrivals, s: solve_MILP_rolling(M, arrivals, s, 4, 2, backend='highs'),
+    lambda M, arrivals, s: solve_MILP_coarse(M, arrivals, s, 2, backend='highs'),
+])
+def test_fractional_arrival_times_are_rejected(solve):
+    M, arrivals, s = instance(0)
+    whole = [dict(job, arrival_time=float(job['arrival_time'])) for job in arrivals]
+    assert solve(M, whole, s)[:2] == solve(M, arrivals, s)[:2]
+    arrivals[1]['arrival_time'] += 0.5
+    with pytest.raises(ValueError):
+        solve(M, arrivals, s)
+
+
+@pytest.mark.parametrize('seed', range(15))
+@pytest.mark.parametrize('window, commit', [(3, 1), (6, 3), (8, 8)])
+def test_rolling_bounds_bracket_the_optimum(seed, window, commit):
+    M, arrivals, s = instance(seed)
+    optimum = solve_MILP_online(M, arrivals, s, backend='highs')[0]
+    total_latency, start_times, lower_bound = solve_MILP_rolling(M, arrivals, s, window, commit,
+                                                                 backend='highs')
+    if optimum is None:
+        assert total_latency is None
+    else:
+        assert lower_bound <= optimum <= total_latency
+        assert is_feasible(M, arrivals, s, start_times)
+        assert total_latency == sum(start_times[i] - job['arrival_time'] + job['length']
+                                    for i, job in enumerate(arrivals))
+
+
+@pytest.mark.parametrize('seed', range(15))
+@pytest.mark.parametrize('delta', [1, 2, 4])
+def test_coarse_bounds_bracket_the_optimum(seed, delta):
+    M, arrivals, s = instance(seed)
+    optimum = solve_MILP_online(M, arrivals, s, backend='highs')[0]
+    total_latency, start_times, lower_bound = solve_MILP_coarse(M, arrivals, s, delta, backend='highs')
+    if optimum is None:
+        assert total_latency is None
+        return
+    assert lower_bound <= optimum <= total_latency
+    assert is_feasible(M, arrivals, s, start_times)
+    if delta == 1:
+        assert lower_bound == optimum
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_capacity_curve_matches_separate_solves(seed):
+    M, arrivals, s = instance(seed)
+    smallest = s + max(job['length'] for job in arrivals)
+    # Decreasing order, with a capacity too small for some job and a duplicate
+    M_values = [M + 15, M + 4, M, smallest + 2, smallest, smallest - 1, M]
+    curve = solve_MILP_capacity_curve(M_values, arrivals, s, backend='highs')
+    assert [point['M'] for point in curve] == sorted(set(M_values))
+    for point in curve:
+        optimum, _ = solve_MILP_online(point['M'], arrivals, s, backend='highs')
+        assert point['total_latency'] == optimum
+        if optimum is None:
+            assert point['start_times'] is None
+        else:
+            assert is_feasible(point['M'], arrivals, s, point['start_times'])
+
+
+def test_mps_backend_writes_the_model(tmp_path):
+    M, arrivals, s = instance(1)
+    path = tmp_path / 'model.mps'
+    assert solve_MILP_online(M, arrivals, s, backend='mps', mps_path=str(path)) == (None, None)
+    for written in (path, tmp_path / 'model.mst'):
+        assert written.exists() and written.stat().st_size > 0
+    assert 'x_0_' in path.read_text()
+
+
+def test_mps_backend_needs_a_path():
+    M, arrivals, s = instance(1)
+    with pytest.raises(ValueError, match='mps_path'):
+        solve_MILP_online(M, arrivals, s, backend='mps')
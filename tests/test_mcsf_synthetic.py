@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from script_loader import load_script
+
+mcsf = load_script('MC-SF_synthetic.py')
+
+
+def peak_usage(s, jobs, after):
+    """Largest memory use at a time step after `after`, summing every (start, length) job."""
+    horizon = max((p + o for p, o in jobs), default=after)
+    return max((sum(s + x - p for p, o in jobs if p < x <= p + o)
+                for x in range(after + 1, horizon + 1)), default=0)
+
+
+def brute_force_schedule(M, s, arrivals, max_time=10000):
+    """MC-SF checked one time step at a time, with the memory of every step summed."""
+    start_times = {}
+    for t in range(max_time):
+        if len(start_times) == len(arrivals):
+            break
+        scheduled = [(start_times[i], arrivals[i]['length']) for i in start_times]
+        waiting = sorted((job['length'], i) for i, job in enumerate(arrivals)
+                         if i not in start_times and job['arrival_time'] <= t)
+        for length, i in waiting:
+            if peak_usage(s, scheduled + [(t, length)], t) > M:
+                break
+            scheduled.append((t, length))
+            start_times[i] = t
+    return start_times
+
+
+def instance(seed):
+    rng = random.Random(seed)
+    s = rng.randint(1, 4)
+    arrivals = [{'arrival_time': rng.randint(0, 30), 'length': rng.randint(1, 12)}
+                for _ in range(rng.randint(1, 25))]
+    M = rng.randint(s + max(job['length'] for job in arrivals), 80)
+    return M, arrivals, s
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_engine_matches_brute_force(seed):
+    rng = random.Random(seed)
+    M, s = rng.randint(20, 80), rng.randint(1, 4)
+    engine = mcsf.FeasibilityEngine(M, s)
+    jobs = []
+    for t in range(0, 40, rng.randint(1, 3)):
+        engine.release(t)
+        jobs = [(p, o) for p, o in jobs if p + o > t]
+        if jobs:
+            # Before the first completion, the first time a job of each length fits
+            horizon = min(min(p + o for p, o in jobs), t + 15)
+            for o_val in range(1, 12, 3):
+                expected = next((u for u in range(t + 1, horizon)
+                                 if peak_usage(s, jobs + [(u, o_val)], u) <= M), horizon)
+                assert engine.next_admissible(t, o_val, horizon) == expected
+        for _ in range(rng.randint(0, 4)):
+            o_val = rng.randint(1, 12)
+            fits = peak_usage(s, jobs + [(t, o_val)], t) <= M
+            assert engine.try_add(t, o_val) == fits
+            if fits:
+                jobs.append((t, o_val))
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_schedule_matches_brute_force(seed):
+    M, arrivals, s = instance(seed)
+    start_times, total_latency = mcsf.online_semi_online_scheduling(M, arrivals, s)
+    assert start_times == brute_force_schedule(M, s, arrivals)
+    jobs = [(start_times[i], job['length']) for i, job in enumerate(arrivals)]
+    assert all(start_times[i] >= job['arrival_time'] for i, job in enumerate(arrivals))
+    assert peak_usage(s, jobs, -1) <= M
+    assert total_latency == sum(p + o - job['arrival_time'] for (p, o), job in zip(jobs, arrivals))
+
+
+def test_job_that_never_fits():
+    arrivals = [{'arrival_time': 0, 'length': 3}, {'arrival_time': 2, 'length': 9}]
+    with pytest.raises(ValueError, match='can never fit'):
+        mcsf.online_semi_online_scheduling(10, arrivals, 2)
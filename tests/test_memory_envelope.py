@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from memory_envelope import MemoryEnvelope
+
+
+def brute_force_peak(resident, step):
+    """Peak of mem(K) over the future completion steps K, by summing every request."""
+    peak = 0
+    for K in range(step + 1, max((end for end, _ in resident), default=step) + 1):
+        peak = max(peak, sum(b + K for end, b in resident if end >= K))
+    return peak
+
+
+def request(step, input_size, output_size, tokens_processed=0):
+    # (absolute completion step, b) as in the MemoryEnvelope docstring
+    return step + output_size + 1 - tokens_processed, input_size + tokens_processed - step
+
+
+def advance(resident, step):
+    return [(end, b) for end, b in resident if end > step]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_admit_matches_brute_force(seed):
+    rng = random.Random(seed)
+    M = rng.randint(50, 400)
+    envelope = MemoryEnvelope(M, capacity=rng.choice([1, 4, 1024]))
+    resident = []
+    step = 0
+    for _ in range(150):
+        if rng.random() < 0.3:
+            steps = rng.randint(1, 5)
+            step += steps
+            envelope.advance(steps)
+            resident = advance(resident, step)
+        else:
+            input_size, output_size = rng.randint(1, 30), rng.randint(1, 40)
+            tokens_processed = rng.randint(0, output_size) if rng.random() < 0.2 else 0
+            candidate = request(step, input_size, output_size, tokens_processed)
+            expected = brute_force_peak(resident + [candidate], step)
+            assert envelope.peak_with(input_size, output_size, tokens_processed) == expected
+            admitted = envelope.admit(input_size, output_size, tokens_processed)
+            assert admitted == (expected <= M)
+            if admitted:
+                resident.append(candidate)
+        assert envelope.peak() == brute_force_peak(resident, step)
+        assert len(envelope) == len(resident)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_admit_prefix_matches_brute_force(seed):
+    rng = random.Random(seed)
+    M = rng.randint(100, 1000)
+    envelope = MemoryEnvelope(M)
+    resident = []
+    step = 0
+    for _ in range(40):
+        candidates = [(rng.randint(1, 30), rng.randint(1, 40)) for _ in range(rng.randint(0, 12))]
+        expected = 0
+        while (expected < len(candidates) and brute_force_peak(
+                resident + [request(step, *c) for c in candidates[:expected + 1]], step) <= M):
+            expected += 1
+        assert envelope.admit_prefix(candidates) == expected
+        resident += [request(step, *c) for c in candidates[:expected]]
+        assert envelope.peak() == brute_force_peak(resident, step)
+        steps = rng.randint(1, 6)
+        step += steps
+        envelope.advance(steps)
+        resident = advance(resident, step)
+        assert envelope.peak() == brute_force_peak(resident, step)
+
+
+def test_rejections_do_not_accumulate_in_the_heap():
+    envelope = MemoryEnvelope(100)
+    envelope.add(10, 50)
+    for output_size in range(10000):
+        assert not envelope.admit(200, output_size % 500)
+    assert len(envelope._end_heap) <= 2 * len(envelope._ends) + 2
+    envelope.advance(60)
+    assert len(envelope) == 0 and envelope.peak() == 0
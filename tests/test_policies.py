@@ -0,0 +1,53 @@
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from policies import AlphaBeta, AlphaGreedy, MCBenchmark, MCSF
+from request_trace import Trace
+from simulator import Simulator
+
+POLICIES = {
+    'MC-SF': lambda: MCSF(),
+    'MC-Benchmark': lambda: MCBenchmark(),
+    'alpha-greedy': lambda: AlphaGreedy(0.2, 64),
+    'alpha-beta': lambda: AlphaBeta(0.2, 0.3, 64, rng=random.Random(1)),
+}
+
+# (policy, trace seed, M, time limit, completed requests, memory resets, average latency).
+# MC-SF and MC-Benchmark differ from the original scripts: the lookahead counts whole
+# decode steps, and MC-SF breaks ties between equal output sizes by request id.
+REFERENCE = [
+    ('MC-SF', 0, 20000, 400, 300, 0, 22.718880679697047),
+    ('MC-Benchmark', 0, 20000, 400, 300, 0, 25.06227928969708),
+    ('alpha-greedy', 0, 20000, 400, 238, 22, 29.292745615489515),
+    ('alpha-beta', 0, 20000, 400, 300, 1, 28.159868902697085),
+    ('MC-SF', 0, 5000, 100, 213, 0, 16.619955457251685),
+    ('MC-Benchmark', 0, 5000, 100, 152, 0, 35.22970568723385),
+    ('alpha-greedy', 0, 5000, 100, 1, 21, 1.6484700923231248),
+    ('alpha-beta', 0, 5000, 100, 14, 53, 34.42060065952497),
+    ('MC-SF', 1, 20000, 400, 300, 0, 24.478795369817476),
+    ('MC-Benchmark', 1, 20000, 400, 300, 0, 27.718666615150834),
+    ('alpha-greedy', 1, 20000, 400, 300, 0, 28.679555799150865),
+    ('alpha-beta', 1, 20000, 400, 300, 0, 28.679555799150865),
+    ('MC-SF', 1, 5000, 100, 212, 0, 16.119268751186155),
+    ('MC-Benchmark', 1, 5000, 100, 153, 0, 38.613405765346336),
+    ('alpha-greedy', 1, 5000, 100, 1, 23, 3.0504431083562316),
+    ('alpha-beta', 1, 5000, 100, 9, 56, 11.908657897534875),
+]
+
+
+def trace(seed, n=300):
+    rng = np.random.default_rng(seed)
+    return Trace(np.sort(rng.uniform(0, 60, n)), rng.integers(10, 400, n), rng.integers(1, 300, n))
+
+
+@pytest.mark.parametrize('name, seed, M, time_limit, num_completed, memory_resets, latency', REFERENCE)
+def test_policy_matches_reference(name, seed, M, time_limit, num_completed, memory_resets, latency):
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulator(trace(seed), POLICIES[name](), M, time_limit=time_limit).run()
+    assert sim.num_completed == num_completed
+    assert sim.memory_resets == memory_resets
+    assert sim.average_latency() == pytest.approx(latency, rel=1e-9)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from request_trace import load_trace
+
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write('arrival_time,input,output\n')
+        f.writelines(f"{t},{i},{o}\n" for t, i, o in rows)
+
+
+def test_csv_with_float_token_counts(tmp_path):
+    path = tmp_path / 'trace.csv'
+    write_csv(path, [(0.5, 12.0, 3.0), (1.25, 7.0, 40.0)])
+    trace = load_trace(path, cache=False)
+    assert trace['input'].dtype == np.int32
+    assert trace['input'].tolist() == [12, 7]
+    assert trace['output'].tolist() == [3, 40]
+
+
+def test_csv_with_fractional_token_counts(tmp_path):
+    path = tmp_path / 'trace.csv'
+    write_csv(path, [(0.5, 12.5, 3)])
+    with pytest.raises(ValueError):
+        load_trace(path, cache=False)
+
+
+def test_cache_dir(tmp_path):
+    path = tmp_path / 'trace.csv'
+    write_csv(path, [(0.5, 12, 3), (1.0, 7, 40)])
+    cache_dir = tmp_path / 'elsewhere'
+    load_trace(path, cache_dir=cache_dir)
+    assert sorted(os.listdir(cache_dir)) == ['arrival_time.npy', 'input.npy', 'output.npy']
+    assert not os.path.exists(str(path) + '.cache')
+    trace = load_trace(path, cache_dir=cache_dir)
+    assert trace['output'].tolist() == [3, 40]
+
+
+def test_cache_falls_back_when_the_trace_directory_is_not_writable(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    os.makedirs(tmp_path / 'tmp')
+    path = tmp_path / 'trace.csv'
+    write_csv(path, [(0.5, 12, 3), (1.0, 7, 40)])
+    # The default cache location cannot be created
+    (tmp_path / 'trace.csv.cache').write_text('')
+    assert load_trace(path)['input'].tolist() == [12, 7]
+    cached = os.listdir(tmp_path / 'tmp' / 'trace-cache')
+    assert len(cached) == 1 and cached[0].startswith('trace.csv-')
+    assert load_trace(path)['input'].tolist() == [12, 7]
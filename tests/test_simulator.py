@@ -0,0 +1,123 @@
+import contextlib
+import functools
+import io
+import math
+import random
+
+import numpy as np
+import pytest
+
+import workload
+from policies import AlphaBeta, AlphaGreedy, MCBenchmark, MCSF
+from profiling import PhaseProfiler
+from request_trace import Trace
+from simulator import RequestStore, Simulator, run_prefixes
+
+
+def poisson_trace(n, rate=2.5, seed=0):
+    return next(workload.generate_workload(n, workload.Poisson(rate), workload.Uniform(10, 400),
+                                           workload.LogNormal(100, 0.8, 1000), chunk_size=n, seed=seed))
+
+
+def test_slot_bytes_match_the_columns():
+    store = RequestStore(capacity=16)
+    assert RequestStore.SLOT_BYTES == 45
+    assert sum(getattr(store, name).nbytes for name, _ in RequestStore.FIELDS) == 16 * RequestStore.SLOT_BYTES
+
+
+def test_head_of_line_request_keeps_the_state_bounded():
+    trace = poisson_trace(3000)
+    output = trace['output'].copy()
+    output[0] = 10 ** 6  # Still running when every other request has completed
+    trace = Trace(trace['arrival_time'], trace['input'], output)
+    for policy, max_slots in ((MCSF, 200), (functools.partial(AlphaGreedy, 0.2, 64), len(trace))):
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = Simulator(trace, policy(), 20000, time_limit=trace['arrival_time'][-1]).run()
+        assert sim.num_completed > 0
+        assert len(sim._latency_partials) <= 8
+        assert math.isfinite(sim.average_latency())
+        # Only the requests in the system hold a slot (MC-SF keeps up with the load)
+        assert len(sim.requests) == sim.num_arrivals - sim.num_completed
+        assert sim.requests.num_slots <= max_slots
+
+
+def test_latency_sum_is_exact():
+    sim = Simulator(poisson_trace(10), MCSF(), 20000)
+    latencies = [1e16, 1.0, -1e16, 3.5, 0.1, 0.2, 0.3] * 3
+    sim._add_latencies(latencies)
+    assert sim.num_completed == len(latencies)
+    assert sim.average_latency() == math.fsum(latencies) / len(latencies)
+
+
+POLICIES = {
+    'MC-SF': lambda: MCSF(),
+    'MC-Benchmark': lambda: MCBenchmark(),
+    'alpha-greedy': lambda: AlphaGreedy(0.2, 64),
+    'alpha-beta': lambda: AlphaBeta(0.2, 0.3, 64, rng=random.Random(1)),
+}
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('name', list(POLICIES))
+def test_fast_forward_matches_batch_by_batch(name, seed):
+    trace = poisson_trace(800, rate=3.0, seed=seed)
+    runs = []
+    for fast_forward in (True, False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs.append(Simulator(trace, POLICIES[name](), 15000, time_limit=300,
+                                  fast_forward=fast_forward).run())
+    fast, slow = runs
+    assert fast.num_completed == slow.num_completed > 0
+    assert fast.num_batches == slow.num_batches
+    assert fast.memory_resets == slow.memory_resets
+    assert fast.average_latency() == slow.average_latency()
+    for column in ('time', 'memory_in_use', 'num_of_tasks'):
+        assert np.array_equal(fast.telemetry.column(column), slow.telemetry.column(column))
+
+
+@pytest.mark.parametrize('name', list(POLICIES))
+def test_profiled_run_matches_unprofiled(name):
+    trace = poisson_trace(800, rate=3.0, seed=1)
+    profiler = PhaseProfiler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiled = Simulator(trace, POLICIES[name](), 15000, time_limit=300, profiler=profiler).run()
+        plain = Simulator(trace, POLICIES[name](), 15000, time_limit=300).run()
+    assert profiled.num_completed == plain.num_completed > 0
+    assert profiled.num_batches == plain.num_batches
+    assert profiled.memory_resets == plain.memory_resets
+    assert profiled.average_latency() == plain.average_latency()
+    for column in ('time', 'memory_in_use', 'num_of_tasks'):
+        assert np.array_equal(profiled.telemetry.column(column), plain.telemetry.column(column))
+
+    phases = profiler.phases()
+    assert phases['run']['calls'] == 1
+    assert phases['complete_batch']['calls'] + phases['fast_forward']['calls'] >= 1
+    assert {'collect_tokens', 'admit', 'waiting_queue', 'processing_time', 'telemetry'} <= set(phases)
+    assert ('lookahead' in phases) == name.startswith('MC')
+    assert all(stack[0] == 'run' for stack in profiler.stacks)
+    assert not profiler._active
+
+
+@pytest.mark.parametrize('shuffled', [False, True])
+@pytest.mark.parametrize('name', list(POLICIES))
+def test_run_prefixes_matches_separate_runs(name, shuffled):
+    trace = poisson_trace(600, rate=4.0, seed=2)
+    if shuffled:
+        order = np.random.default_rng(0).permutation(len(trace))
+        trace = Trace(*(trace[column][order] for column in ('arrival_time', 'input', 'output')))
+    sizes = [150, 300, 450, 600]
+    with contextlib.redirect_stdout(io.StringIO()):
+        forked = list(run_prefixes(trace, sizes, POLICIES[name](), 12000, time_limit=200))
+        separate = [Simulator(trace.head(size), POLICIES[name](), 12000, time_limit=200).run()
+                    for size in sizes]
+    assert [size for size, _ in forked] == sizes
+    for (_, sim), reference in zip(forked, separate):
+        assert sim.num_completed == reference.num_completed
+        assert sim.num_batches == reference.num_batches
+        assert sim.memory_resets == reference.memory_resets
+        assert sim.average_latency() == reference.average_latency()
+        for column in ('time', 'memory_in_use', 'num_of_tasks'):
+            assert np.array_equal(sim.telemetry.column(column), reference.telemetry.column(column))
+    if name == 'alpha-beta':
+        # Random resets happen before forks, so the forks must carry on the generator
+        assert any(sim.memory_resets for _, sim in forked[:-1])
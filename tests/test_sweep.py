@@ -0,0 +1,36 @@
+import contextlib
+import io
+import math
+
+import numpy as np
+import pytest
+
+from policies import AlphaGreedy, MCSF
+from request_trace import Trace
+from simulator import Simulator
+from sweep import expand_grid, run_sweep
+
+
+def trace(n=200):
+    rng = np.random.default_rng(3)
+    return Trace(np.sort(rng.uniform(0, 40, n)), rng.integers(10, 400, n), rng.integers(1, 200, n))
+
+
+def test_missing_parameters_are_rejected():
+    with pytest.raises(ValueError):
+        expand_grid(['alpha-greedy'], [100], [10000])
+    with pytest.raises(ValueError):
+        expand_grid(['alpha-beta'], [100], [10000], alpha=[0.2])
+    assert len(expand_grid(['MC-SF', 'alpha-greedy'], [100], [10000], alpha=[0.2])) == 2
+
+
+def test_sweep_matches_separate_runs():
+    results = run_sweep(trace(), ['MC-SF', 'alpha-greedy'], [100, 200], [20000], alpha=[0.2],
+                        time_limit=300, max_workers=2)
+    assert len(results) == 4
+    for row in results.itertuples():
+        policy = MCSF() if row.policy == 'MC-SF' else AlphaGreedy(0.2, None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = Simulator(trace().head(row.num_rows), policy, row.M, time_limit=300).run()
+        assert row.completed == sim.num_completed
+        assert math.isclose(row.average_latency, sim.average_latency(), rel_tol=1e-12)
@@ -0,0 +1,66 @@
+import copy
+import gc
+import os
+import pickle
+
+import numpy as np
+
+from telemetry import Telemetry
+
+
+def spilled_telemetry(num_samples=100):
+    telemetry = Telemetry(chunk_size=8, memory_budget=1)
+    for i in range(num_samples):
+        telemetry.record(float(i), 10 * i, i % 7)
+    assert telemetry.num_spilled
+    return telemetry
+
+
+def test_temporary_spill_dir_is_deleted():
+    telemetry = spilled_telemetry()
+    spill_dir = telemetry.spill_dir
+    assert os.path.isdir(spill_dir)
+    telemetry.close()
+    assert not os.path.exists(spill_dir)
+
+    telemetry = spilled_telemetry()
+    spill_dir = telemetry.spill_dir
+    del telemetry
+    gc.collect()
+    assert not os.path.exists(spill_dir)
+
+
+def test_given_spill_dir_is_kept(tmp_path):
+    telemetry = Telemetry(chunk_size=8, memory_budget=1, spill_dir=str(tmp_path / 'spill'))
+    for i in range(20):
+        telemetry.record(float(i), i, 1)
+    telemetry.close()
+    assert os.listdir(tmp_path / 'spill')
+
+
+def test_copies_spill_to_their_own_directory():
+    telemetry = spilled_telemetry()
+    copied = copy.deepcopy(telemetry)
+    assert copied.spill_dir != telemetry.spill_dir
+    for i in range(100, 150):
+        telemetry.record(float(i), 10 * i, 1)
+        copied.record(float(i), -1, 2)
+    assert telemetry.time.tolist() == copied.time.tolist() == list(range(150))
+    assert telemetry.memory_in_use.tolist() == [10 * i for i in range(150)]
+    assert copied.memory_in_use.tolist() == [10 * i for i in range(100)] + [-1] * 50
+
+    spill_dir = copied.spill_dir
+    del copied
+    gc.collect()
+    assert not os.path.exists(spill_dir)
+    assert len(telemetry.time) == 150
+
+
+def test_pickled_copy_keeps_the_samples():
+    telemetry = spilled_telemetry()
+    data = pickle.dumps(telemetry)
+    expected = telemetry.num_of_tasks.tolist()
+    telemetry.close()
+    restored = pickle.loads(data)
+    assert restored.num_of_tasks.tolist() == expected
+    assert np.array_equal(restored.time, np.arange(100.0))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+import workload
+
+
+@pytest.mark.parametrize('lengths', [workload.LogNormal(100, 8), workload.Pareto(0.2, 10)])
+def test_heavy_tails_do_not_overflow(lengths):
+    trace = next(workload.generate_workload(50000, workload.Poisson(1.0), lengths, lengths,
+                                            chunk_size=50000, seed=1))
+    for name in ('input', 'output'):
+        assert trace[name].min() >= 1
+        assert trace[name].max() == workload.MAX_LENGTH
+
+
+def test_chunks_do_not_change_the_requests():
+    parameters = dict(arrivals=workload.Poisson(2.0), input_lengths=workload.Uniform(1, 50),
+                      output_lengths=workload.LogNormal(40, 1.0, 500), seed=7)
+    whole = next(workload.generate_workload(1000, chunk_size=1000, **parameters))
+    chunks = list(workload.generate_workload(1000, chunk_size=300, **parameters))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    for name in ('arrival_time', 'input', 'output'):
+        assert np.array_equal(np.concatenate([chunk[name] for chunk in chunks]), whole[name])
@@ -0,0 +1,55 @@
+import heapq
+
+
+class WaitingQueue:
+    """
+    Waiting requests kept in policy order, as a binary heap of (key(item), item) entries.
+
+    The schedulers used to sort the whole waiting set on every batch formation; here
+    inserting and popping cost O(log n) and only the requests that are actually looked
+    at leave the heap. Ties in the key are broken by the item itself (the request id),
+    so the order is deterministic. Requests that were popped but not admitted, or that
+    were reset after starting, are simply pushed again.
+    """
+
+    def __init__(self, key, items=()):
+        self._key = key
+        self._heap = [(key(item), item) for item in items]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def push(self, item):
+        heapq.heappush(self._heap, (self._key(item), item))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[1]
+
+    def peek(self):
+        return self._heap[0][1]
+
+    def pop_prefix(self, admit):
+        """
+        Pops the longest prefix accepted by `admit`.
+
+        `admit` receives an iterator over the queue in order and returns how many of the
+        leading items it accepts. Items are only popped as the iterator advances, and the
+        ones that were looked at but not accepted go back into the queue.
+        Returns the list of accepted items.
+        """
+        seen = []
+
+        def ordered():
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                seen.append(entry)
+                yield entry[1]
+
+        num_accepted = admit(ordered())
+        for entry in seen[num_accepted:]:
+            heapq.heappush(self._heap, entry)
+        return [item for _, item in seen[:num_accepted]]
@@ -0,0 +1,176 @@
+import numpy as np
+
+from request_trace import DTYPES, Trace
+
+
+# -------------------------------
+# Arrival processes
+# -------------------------------
+class Poisson:
+    """Poisson arrivals at `rate` requests per second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def stream(self, rng, chunk_size):
+        """Infinite sequence of arrays of `chunk_size` increasing arrival times."""
+        t = 0.0
+        while True:
+            times = t + np.cumsum(rng.exponential(1 / self.rate, chunk_size))
+            t = times[-1]
+            yield times
+
+
+class MMPP:
+    """
+    Markov-modulated Poisson process: arrivals at rates[k] while in state k, and the
+    state changes after an exponential time of mean mean_durations[k] to another state
+    chosen uniformly (bursts: a short state with a high rate).
+    """
+
+    def __init__(self, rates, mean_durations):
+        if len(rates) != len(mean_durations) or len(rates) < 2:
+            raise ValueError("MMPP needs the rates and mean durations of at least two states")
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.mean_durations = np.asarray(mean_durations, dtype=np.float64)
+
+    def stream(self, rng, chunk_size):
+        num_states = len(self.rates)
+        t = 0.0
+        state = 0
+        pending = np.empty(0)
+        while True:
+            parts = [pending]
+            count = len(pending)
+            while count < chunk_size:
+                # Arrivals of one sojourn: a Poisson number of them, uniform over its duration
+                duration = rng.exponential(self.mean_durations[state])
+                times = t + np.sort(rng.uniform(0, duration, rng.poisson(self.rates[state] * duration)))
+                parts.append(times)
+                count += len(times)
+                t += duration
+                state = (state + rng.integers(1, num_states)) % num_states
+            times = np.concatenate(parts)
+            pending = times[chunk_size:]
+            yield times[:chunk_size]
+
+
+class Diurnal:
+    """
+    Non-homogeneous Poisson arrivals with rate
+        base_rate * (1 + amplitude * sin(2π (t - phase) / period)),
+    0 <= amplitude <= 1, a day of `period` seconds by default, sampled by thinning.
+    """
+
+    def __init__(self, base_rate, amplitude=0.5, period=86400.0, phase=0.0):
+        if not 0 <= amplitude <= 1:
+            raise ValueError("amplitude must be between 0 and 1")
+        self.base_rate = base_rate
+        self.amplitude = amplitude
+        self.period = period
+        self.phase = phase
+
+    def rate(self, t):
+        return self.base_rate * (1 + self.amplitude * np.sin(2 * np.pi * (t - self.phase) / self.period))
+
+    def stream(self, rng, chunk_size):
+        max_rate = self.base_rate * (1 + self.amplitude)
+        t = 0.0
+        pending = np.empty(0)
+        while True:
+            parts = [pending]
+            count = len(pending)
+            while count < chunk_size:
+                candidates = t + np.cumsum(rng.exponential(1 / max_rate, chunk_size))
+                t = candidates[-1]
+                times = candidates[rng.random(chunk_size) * max_rate < self.rate(candidates)]
+                parts.append(times)
+                count += len(times)
+            times = np.concatenate(parts)
+            pending = times[chunk_size:]
+            yield times[:chunk_size]
+
+
+# -------------------------------
+# Length distributions
+# -------------------------------
+# Lengths are stored as int32 (see request_trace.DTYPES): heavy tails are clipped to the
+# largest one rather than wrap around to negative values
+MAX_LENGTH = int(np.iinfo(DTYPES['output']).max)
+
+
+class Uniform:
+    """Lengths uniform over [low, high]."""
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng, n):
+        return rng.integers(self.low, self.high + 1, n)
+
+
+class LogNormal:
+    """Log-normal lengths of the given median, clipped to [1, maximum] (MAX_LENGTH by default)."""
+
+    def __init__(self, median, sigma, maximum=None):
+        self.median = median
+        self.sigma = sigma
+        self.maximum = MAX_LENGTH if maximum is None else min(maximum, MAX_LENGTH)
+
+    def sample(self, rng, n):
+        lengths = np.rint(rng.lognormal(np.log(self.median), self.sigma, n))
+        return np.clip(lengths, 1, self.maximum)
+
+
+class Pareto:
+    """
+    Pareto lengths of tail index `alpha` from `minimum` on, clipped to `maximum`
+    (MAX_LENGTH by default).
+    """
+
+    def __init__(self, alpha, minimum, maximum=None):
+        self.alpha = alpha
+        self.minimum = minimum
+        self.maximum = MAX_LENGTH if maximum is None else min(maximum, MAX_LENGTH)
+
+    def sample(self, rng, n):
+        lengths = np.floor(self.minimum * (1 + rng.pareto(self.alpha, n)))
+        return np.clip(lengths, self.minimum, self.maximum)
+
+
+# -------------------------------
+# Workloads
+# -------------------------------
+def generate_workload(num_requests, arrivals, input_lengths, output_lengths,
+                      chunk_size=1 << 16, seed=0):
+    """
+    Generates `num_requests` requests lazily, as request_trace.Trace chunks of at most
+    `chunk_size` requests in order of arrival, so that only one chunk is in memory at a
+    time. `arrivals` is an arrival process (Poisson, MMPP or Diurnal), and
+    `input_lengths` and `output_lengths` are length distributions (Uniform, LogNormal or
+    Pareto). The same seed gives the same requests whatever the chunk size.
+
+    Both simulators consume the chunks: run_stream in simulator.py for the real-trace
+    policies and online_semi_online_scheduling_stream in MC-SF_synthetic.py.
+    """
+    arrival_rng, input_rng, output_rng = (np.random.default_rng(child)
+                                          for child in np.random.SeedSequence(seed).spawn(3))
+    # Arrival times are drawn in blocks of a fixed size, so they do not depend on chunk_size
+    block_size = 1 << 12
+    times = arrivals.stream(arrival_rng, block_size)
+    buffered = np.empty(0)
+    remaining = num_requests
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        parts = [buffered]
+        count = len(buffered)
+        while count < n:
+            block = next(times)
+            parts.append(block)
+            count += len(block)
+        arrival_time = np.concatenate(parts)
+        buffered = arrival_time[n:]
+        yield Trace(arrival_time[:n], input_lengths.sample(input_rng, n),
+                    output_lengths.sample(output_rng, n))
+        remaining -= n